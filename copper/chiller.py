@@ -10,6 +10,7 @@ from copper.generator import *
 from copper.units import Units
 from copper.curves import *
 from copper.library import *
+import copper.kernels as kernels
 import logging
 
 location = os.path.dirname(os.path.realpath(__file__))
@@ -159,6 +160,9 @@ class Chiller:
 
         self.ref_lwt, self.ref_ect, self.ref_lct = lwt, ect, lct
 
+        # Polynomial terms of curves at rated conditions
+        self.rated_basis = {}
+
     def get_ref_values(self, out_var):
         """Get chiller reference/rated independent variables values (temperature and part load ratio) for an output variable (e.g., eir-f-t, eir-f-plr, cap-f-t).
 
@@ -269,6 +273,9 @@ class Chiller:
         export_name="",
         num_nearest_neighbors=10,
         max_restart=None,
+        nn_vars=["ref_cap", "full_eff"],
+        nn_metric="l1",
+        nn_weights=None,
     ):
         """Generate a set of curves for a particular Chiller object.
 
@@ -284,6 +291,9 @@ class Chiller:
         :param float mutate: Probability of an individual to be mutated in the next generation
         :param tuple() bounds: Random modification bounds
         :param int random_seed: Integer that is used to inialize the random number generator, this should be used when identical results are needed from one run to another
+        :param list nn_vars: Chiller attributes used to find the nearest neighbors of the chiller, used by the `nearest_neighbor` and `weighted_average` methods
+        :param str nn_metric: Distance metric used to find the nearest neighbors of the chiller: `l1`, `l2`, or `mahalanobis`
+        :param list nn_weights: Weights associated with each attribute in nn_vars
         :return: Set of curves object generated by the genetic algorithm that matches the Chiller object definition
         :rtype: SetofCurves
 
@@ -305,6 +315,9 @@ class Chiller:
             random_seed,
             num_nearest_neighbors,
             max_restart,
+            nn_vars=nn_vars,
+            nn_metric=nn_metric,
+            nn_weights=nn_weights,
         )
         set_of_curves = ga.generate_set_of_curves(verbose=verbose)
 
@@ -372,6 +385,66 @@ class Chiller:
 
         return eir
 
+    def get_rated_basis(self, curve, alt):
+        """Get the polynomial terms of a temperature curve at rated conditions.
+
+        The terms only depend on the rated temperatures, the curve type and the curve bounds so they are only computed once.
+
+        :param Curve curve: Temperature curve modifier (e.g. cap-f-t or eir-f-t)
+        :param bool alt: Indicate the chiller alternate standard rating should be used
+        :return: Polynomial terms at each rated entering condenser temperature followed by the reference entering condenser temperature
+        :rtype: list
+
+        """
+        std = self.part_eff_ref_std_alt if alt else self.part_eff_ref_std
+        key = (std, curve.type, curve._x_bounds, curve._y_bounds)
+        if not key in self.rated_basis.keys():
+            ect, lwt = self.get_rated_temperatures(alt)
+            self.rated_basis[key] = curve.get_basis(lwt, ect + [self.ref_ect]).tolist()
+        return self.rated_basis[key]
+
+    def calc_rated_eff_ect(self, cap_f_t, eir_f_t, eir_f_plr, eir_ref, loads, alt):
+        """Calculate chiller efficiency using the ECT-based model at each rated conditions.
+
+        :param Curve cap_f_t: Capacity curve modifier as a function of temperature (LWT and ECT)
+        :param Curve eir_f_t: Energy Input Ratio curve modifier as a function of temperature (LWT and ECT)
+        :param Curve eir_f_plr: Energy Input Ratio curve modifier as a function of part load ratio
+        :param float eir_ref: Reference EIR
+        :param list loads: Percentage loads, as defined in AHRI 550/590
+        :param bool alt: Indicate the chiller alternate standard rating should be used
+        :return: EIR, part load ratio, and operating capacity for each load
+        :rtype: list
+
+        """
+        ect, lwt = self.get_rated_temperatures(alt)
+
+        # Temperature adjustments, the last values are at the reference ECT
+        cap_f_lwt_ect = [
+            cap_f_t.evaluate_terms(terms)
+            for terms in self.get_rated_basis(cap_f_t, alt)
+        ]
+        eir_f_lwt_ect = [
+            eir_f_t.evaluate_terms(terms)
+            for terms in self.get_rated_basis(eir_f_t, alt)
+        ]
+
+        # Loads are only 4 points, Python floats are faster than NumPy arrays here
+        eirs, plrs, cap_ops = [], [], []
+        for idx, load in enumerate(loads):
+            # PLR adjustments
+            cap_op = cap_f_lwt_ect[idx]
+            plr = load * cap_f_lwt_ect[-1] / cap_op
+            if plr <= self.min_unloading:
+                plr = self.min_unloading
+            eir_plr = eir_f_plr.evaluate(plr, ect[idx] - lwt)
+
+            # Efficiency calculation
+            eirs.append(eir_ref * eir_f_lwt_ect[idx] * eir_plr / plr)
+            plrs.append(plr)
+            cap_ops.append(cap_op)
+
+        return [eirs, plrs, cap_ops]
+
     def calc_rated_eff(self, eff_type, unit="kw/ton", output_report=False, alt=False):
         """Calculate chiller efficiency.
 
@@ -408,14 +481,18 @@ class Chiller:
         eir_f_plr = curves["eir_f_plr"]
 
         try:
+            if self.model == "ect_lwt":
+                # Efficiency calculation for all testing conditions
+                eirs, plrs, cap_ops = self.calc_rated_eff_ect(
+                    cap_f_t, eir_f_t, eir_f_plr, eir_ref, loads, alt
+                )
             for idx, load in enumerate(
                 loads
             ):  # Calculate efficiency for each testing conditions
                 if self.model == "ect_lwt":  # DOE-2 chiller model
-                    # Efficiency calculation
-                    eir = self.calc_eff_ect(
-                        cap_f_t, eir_f_t, eir_f_plr, eir_ref, ect[idx], lwt, load
-                    )
+                    eir, plr, cap_op = eirs[idx], plrs[idx], cap_ops[idx]
+                    if not np.isfinite(eir):
+                        return -999
 
                 elif self.model == "lct_lwt":  # Reformulated EIR chiller model
                     # Determine water properties
@@ -510,12 +587,7 @@ class Chiller:
                     return kwpton
 
             # Coefficients from AHRI Std 551/591
-            iplv = 1 / (
-                (0.01 / kwpton_lst[0])
-                + (0.42 / kwpton_lst[1])
-                + (0.45 / kwpton_lst[2])
-                + (0.12 / kwpton_lst[3])
-            )
+            iplv = kernels.iplv(kwpton_lst)
 
             if output_report:
                 logging.info(f"IPLV: {round(iplv, 3)} kW/ton")
@@ -620,10 +692,6 @@ class Chiller:
             c_p,
         ) = args
 
-        # Temperature dependent curve modifiers
-        cap_f_lwt_lct = cap_f_t.evaluate(lwt, lct)
-        eir_f_lwt_lct = eir_f_t.evaluate(lwt, lct)
-
         # Convert reference capacity to kW
         if self.ref_cap_unit != "kW":
             ref_cap_org = Units(value=self.ref_cap, unit=self.ref_cap_unit)
@@ -631,32 +699,18 @@ class Chiller:
         else:
             ref_cap = self.ref_cap
 
-        # Operating variables
-        cap_op = ref_cap * cap_f_lwt_lct
-        if cap_f_lwt_lct_rated == -999:
-            plr = load
-        else:
-            plr = load * cap_f_lwt_lct_rated / cap_f_lwt_lct
-
-        # PLR and temperature curve modifier
-        eir_f_plr_lct = eir_f_plr.evaluate(lct, plr)
-
-        # Evaporator operating capacity
-        q_e = cap_op * plr
-
-        # Chiller power
-        p = (cap_op / ref_cop) * eir_f_lwt_lct * eir_f_plr_lct
-
-        # Condenser heat transfer
-        q_c = p + q_e
-
-        # Store original ECT
-        ect_org = ect
-
-        # Recalculate ECT
-        ect = lct - q_c / (m_c * c_p)
-
-        return (ect_org - ect) / ect_org
+        return kernels.cond_inlet_temp_residual(
+            lct,
+            lwt,
+            load,
+            cap_f_lwt_lct_rated,
+            ref_cap,
+            ref_cop,
+            ect,
+            m_c,
+            c_p,
+            [c.get_kernel_args() for c in [cap_f_t, eir_f_t, eir_f_plr]],
+        )
 
     def get_lib_and_filters(self, lib_path=chiller_lib):
         """Get chiller library object and chiller specific filters.
@@ -666,7 +720,7 @@ class Chiller:
         :rtype: list
 
         """
-        lib = Library(path=lib_path)
+        lib = load_library(path=lib_path)
         filters = [
             ("eqp_type", "chiller"),
             ("condenser_type", self.condenser_type),
@@ -819,5 +873,5 @@ class Chiller:
         }
 
         self.ranges = self.get_ranges()
-        curves = SetsofCurves(sets=csets, eqp=self)
+        curves = SetsofCurves(sets=csets, eqp=self, lib=lib)
         return curves
@@ -4,40 +4,557 @@ curves.py
 The curves module of Copper handles all operations and manipulation related to curves, set of curves, and sets of curves.
 """
 
-import warnings, json, os
+import warnings, json, os, math, copy
 
 warnings.simplefilter(action="ignore", category=FutureWarning)
 
 import numpy as np
 import pandas as pd
-import statsmodels.api as sm
-import statistics
-import itertools
+from scipy import linalg, optimize
 import logging
 from copper.units import *
+import copper.kernels as kernels
 from copper.constants import LOGGING_FORMAT
 
 logging.basicConfig(format=LOGGING_FORMAT)
 
+# Exponents of the first and second independent variables
+# associated with each coefficient of a curve, e.g. for a
+# bi_quad curve coeff6 is the coefficient of x * y
+CURVE_EXPONENTS = {
+    "quad": np.array([[0, 0], [1, 0], [2, 0]]),
+    "cubic": np.array([[0, 0], [1, 0], [2, 0], [3, 0]]),
+    "bi_quad": np.array([[0, 0], [1, 0], [2, 0], [0, 1], [0, 2], [1, 1]]),
+    "bi_cub": np.array(
+        [
+            [0, 0],
+            [1, 0],
+            [2, 0],
+            [0, 1],
+            [0, 2],
+            [1, 1],
+            [3, 0],
+            [0, 3],
+            [2, 1],
+            [1, 2],
+        ]
+    ),
+}
+
+# Exponents as tuples of Python integers, used by the numerical kernels
+KERNEL_EXPONENTS = {
+    c_type: tuple([tuple(exps) for exps in exponents.tolist()])
+    for c_type, exponents in CURVE_EXPONENTS.items()
+}
+
+
+def get_basis(c_type, x, y):
+    """Compute the polynomial terms of a curve type for values of the independent variables.
+
+    :param str c_type: Copper curve type
+    :param numpy.array x: First curve independent variable values
+    :param numpy.array y: Second curve independent variable values
+    :return: Polynomial terms, the last dimension corresponds to the curve coefficients
+    :rtype: numpy.array
+
+    """
+    if not c_type in CURVE_EXPONENTS.keys():
+        raise ValueError("Type of curve not yet implemented.")
+    exponents = CURVE_EXPONENTS[c_type]
+    x = np.asarray(x, dtype=float)[..., np.newaxis]
+    y = np.asarray(y, dtype=float)[..., np.newaxis]
+    return x ** exponents[:, 0] * y ** exponents[:, 1]
+
+
+def fit_curve_types(x, y, out, curve_types):
+    """Fit the coefficients of several curve types to data using ordinary least squares.
+
+    The design matrix of the curve type with the most coefficients is decomposed once (QR decomposition), the curve types
+    whose polynomial terms are the first terms of that curve type (e.g. `quad` and `bi_quad` for `bi_cub`) are fitted
+    using the same decomposition. Rank deficient problems are solved using the minimum norm solution.
+    Several outputs sampled at the same points can be fitted at once.
+
+    :param numpy.array x: First independent variable values
+    :param numpy.array y: Second independent variable values
+    :param numpy.array out: Output values, either one value per point or one row of values per output
+    :param list curve_types: List of Copper curve types
+    :return: Coefficients and coefficient of determination (R^2) of each curve type, with one row per output if several outputs are fitted
+    :rtype: dict
+
+    """
+    for c_type in curve_types:
+        if not c_type in CURVE_EXPONENTS.keys():
+            raise ValueError("Type of curve not yet implemented.")
+    curve_types = sorted(set(curve_types), key=lambda c: len(CURVE_EXPONENTS[c]))
+    out = np.asarray(out, dtype=float)
+    outs = np.atleast_2d(out).T
+
+    # Decomposition of the largest design matrix, columns are scaled to
+    # improve the conditioning of the problem
+    full_exponents = CURVE_EXPONENTS[curve_types[-1]]
+    full_basis = get_basis(curve_types[-1], x, y)
+    scales = np.linalg.norm(full_basis, axis=0)
+    scales[scales == 0] = 1
+    q, r = np.linalg.qr(full_basis / scales)
+    q_outs = q.T @ outs
+
+    # Total sum of squares
+    tss = np.sum((outs - outs.mean(axis=0)) ** 2, axis=0)
+
+    fits = {}
+    for c_type in curve_types:
+        exponents = CURVE_EXPONENTS[c_type]
+        nb_coeffs = len(exponents)
+        if np.array_equal(exponents, full_exponents[:nb_coeffs]):
+            basis = full_basis[:, :nb_coeffs]
+            c_scales = scales[:nb_coeffs]
+            c_r, c_q_outs = r[:nb_coeffs, :nb_coeffs], q_outs[:nb_coeffs]
+        else:
+            basis = get_basis(c_type, x, y)
+            c_scales = np.linalg.norm(basis, axis=0)
+            c_scales[c_scales == 0] = 1
+            c_q, c_r = np.linalg.qr(basis / c_scales)
+            c_q_outs = c_q.T @ outs
+
+        # Solve the triangular system unless the problem is rank deficient
+        diag = np.abs(np.diag(c_r))
+        if len(outs) >= nb_coeffs and diag.min() > 1e-10 * diag.max():
+            coeffs = linalg.solve_triangular(c_r, c_q_outs) / c_scales[:, np.newaxis]
+        else:
+            coeffs = np.linalg.lstsq(basis, outs, rcond=None)[0]
+
+        # Coefficient of determination
+        rss = np.sum((outs - basis @ coeffs) ** 2, axis=0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            r_sqr = np.where(
+                tss > 0, 1 - rss / tss, np.where(np.isclose(rss, 0), 1.0, 0.0)
+            )
+        if out.ndim == 1:
+            fits[c_type] = (coeffs[:, 0], float(r_sqr[0]))
+        else:
+            fits[c_type] = (coeffs.T, r_sqr)
+
+    return fits
+
+
+def fit_monotonic_curve(x, y, out, c_type, sign_val, var="x", nb_points=20):
+    """Fit the coefficients of a curve type to data using least squares, the curve being constrained to be monotonic.
+
+    The sign of the partial derivative of the curve is constrained at points evenly distributed over the range of the data,
+    the resulting quadratic program is solved using sequential least squares programming (SLSQP).
+
+    :param numpy.array x: First independent variable values
+    :param numpy.array y: Second independent variable values
+    :param numpy.array out: Output values
+    :param str c_type: Copper curve type
+    :param int sign_val: Expected sign of the partial derivative: +1 or -1
+    :param str var: Independent variable used for the derivation: `x` or `y`
+    :param int nb_points: Number of points, for each independent variable, at which the sign of the derivative is constrained
+    :return: Coefficients and coefficient of determination (R^2)
+    :rtype: list
+
+    """
+    x, y, out = np.broadcast_arrays(
+        np.asarray(x, dtype=float).ravel(),
+        np.asarray(y, dtype=float).ravel(),
+        np.asarray(out, dtype=float).ravel(),
+    )
+
+    # Least squares problem, columns are scaled to improve
+    # the conditioning of the problem
+    basis = get_basis(c_type, x, y)
+    scales = np.linalg.norm(basis, axis=0)
+    scales[scales == 0] = 1
+    q, r = np.linalg.qr(basis / scales)
+    q_out = q.T @ out
+
+    # Constraints on the derivative of the curve
+    x_pts = np.linspace(x.min(), x.max(), nb_points)
+    if "bi" in c_type:
+        y_pts = np.linspace(y.min(), y.max(), nb_points)
+    else:
+        y_pts = np.zeros(1)
+    x_pts, y_pts = np.meshgrid(x_pts, y_pts, indexing="ij")
+    x_pts, y_pts = x_pts.reshape(-1, 1), y_pts.reshape(-1, 1)
+    factors, exponents = get_derivative_exponents(c_type, var)
+    d_basis = factors * x_pts ** exponents[:, 0] * y_pts ** exponents[:, 1]
+    d_basis = sign_val * d_basis / scales
+
+    result = optimize.minimize(
+        lambda z: 0.5 * np.sum((r @ z - q_out) ** 2),
+        np.linalg.lstsq(r, q_out, rcond=None)[0],
+        jac=lambda z: r.T @ (r @ z - q_out),
+        constraints=[
+            {"type": "ineq", "fun": lambda z: d_basis @ z, "jac": lambda z: d_basis}
+        ],
+        method="SLSQP",
+        options={"maxiter": 500, "ftol": 1e-12},
+    )
+    coeffs = result.x / scales
+
+    # Coefficient of determination
+    rss = np.sum((out - basis @ coeffs) ** 2)
+    tss = np.sum((out - out.mean()) ** 2)
+    if tss > 0:
+        r_sqr = 1 - rss / tss
+    else:
+        r_sqr = 1.0 if np.isclose(rss, 0) else 0.0
+    return [coeffs, r_sqr]
+
+
+def is_monotonic_cubic(coeffs, sign_val, x_range):
+    """Check if a `cubic` curve is monotonic over a range of its independent variable.
+
+    :param numpy.array coeffs: Curve coefficients
+    :param int sign_val: Expected sign of the derivative: +1 or -1
+    :param tuple x_range: Minimum and maximum values of the independent variable
+    :return: Result of the check
+    :rtype: bool
+
+    """
+    c = Curve.__new__(Curve)
+    c.type = "cubic"
+    c.x_min, c.x_max = None, None
+    c.y_min, c.y_max = None, None
+    c.out_min, c.out_max = None, None
+    c.coeffs = coeffs
+    return c.is_monotonic(sign_val, "x", x_range=x_range)
+
+
+def fit_curves(x, y, outs, curve_types, sign_val=None, constrained=True):
+    """Fit curves to several outputs sampled at the same points and select the best curve type for each output.
+
+    The selected curve type is the one with the highest R^2, `cubic` curves are only selected if they are monotonic over the range
+    of the first independent variable. Non-monotonic `cubic` curves are fitted again with constraints on their derivative
+    unless specified otherwise.
+
+    :param numpy.array x: First independent variable values
+    :param numpy.array y: Second independent variable values
+    :param numpy.array outs: Output values, one row of values per output
+    :param list curve_types: List of Copper curve types
+    :param int sign_val: Expected sign of the derivative of `cubic` curves: +1 or -1, the monotonicity is not checked if not specified
+    :param bool constrained: Fit non-monotonic `cubic` curves again using constraints, see `fit_monotonic_curve()`
+    :return: Selected curve type, coefficients, and R^2 for each output, the type and coefficients are None if no curve could be fitted
+    :rtype: list
+
+    """
+    outs = np.atleast_2d(np.asarray(outs, dtype=float))
+    fits = fit_curve_types(x, y, outs, curve_types)
+
+    # R^2 of each curve type, candidates are ranked in this order
+    c_types = [c for c in ["quad", "cubic", "bi_quad", "bi_cub"] if c in fits.keys()]
+    r_sqrs = np.array([fits[c_type][1] for c_type in c_types])
+    if "cubic" in c_types and sign_val is not None:
+        # Check that the curves are monotonic
+        # over the range of the independent variable
+        x_range = (np.min(x), np.max(x))
+        for idx, coeffs in enumerate(fits["cubic"][0]):
+            if is_monotonic_cubic(coeffs, sign_val, x_range):
+                continue
+            r_sqrs[c_types.index("cubic"), idx] = -np.inf
+            if constrained:
+                coeffs, r = fit_monotonic_curve(x, y, outs[idx], "cubic", sign_val)
+                if is_monotonic_cubic(coeffs, sign_val, x_range):
+                    fits["cubic"][0][idx] = coeffs
+                    r_sqrs[c_types.index("cubic"), idx] = r
+
+    best = np.argmax(r_sqrs, axis=0)
+    r_sqr = r_sqrs[best, np.arange(len(outs))]
+    types, coeffs = [], []
+    for idx, (type_idx, r) in enumerate(zip(best, r_sqr)):
+        if r > 0:
+            types.append(c_types[type_idx])
+            coeffs.append(fits[c_types[type_idx]][0][idx])
+        else:
+            types.append(None)
+            coeffs.append(None)
+    return [types, coeffs, r_sqr]
+
+
+def read_measurements(data, columns, chunksize=100000):
+    """Read measurements by chunks.
+
+    :param data: Path to a CSV or Parquet file, or iterable of pandas.DataFrame
+    :param list columns: Columns to read
+    :param int chunksize: Number of rows read at once
+    :return: Chunks of measurements
+    :rtype: pandas.DataFrame
+
+    """
+    if isinstance(data, (str, os.PathLike)):
+        if str(data).endswith((".parquet", ".pq")):
+            try:
+                import pyarrow.parquet as pq
+            except ImportError:
+                raise ImportError("pyarrow is required to read Parquet files.")
+            for batch in pq.ParquetFile(data).iter_batches(
+                batch_size=chunksize, columns=columns
+            ):
+                yield batch.to_pandas()
+        else:
+            yield from pd.read_csv(data, usecols=columns, chunksize=chunksize)
+    else:
+        for chunk in data:
+            yield chunk[columns]
+
+
+def fit_from_measurements(
+    eqp,
+    out_var,
+    data,
+    x_col,
+    y_col=None,
+    out_col="Y",
+    curve_types=None,
+    chunksize=100000,
+):
+    """Fit curves to measurements, e.g. trend logs, that do not need to fit in memory.
+
+    Measurements are read by chunks and only the sums needed to solve the normal equations of the
+    least squares problem are kept in memory. Rows with missing values are ignored.
+
+    :param eqp: Equipment
+    :param str out_var: Output variable of the curves, e.g. `eir-f-t`
+    :param data: Path to a CSV or Parquet file, or iterable of pandas.DataFrame
+    :param str x_col: Column of the first independent variable
+    :param str y_col: Column of the second independent variable, not needed for univariate curves
+    :param str out_col: Column of the output variable
+    :param list curve_types: List of Copper curve types, defaults to all the univariate or bivariate curve types
+    :param int chunksize: Number of rows read at once
+    :return: Fitted curve and coefficient of determination (R^2) for each curve type
+    :rtype: dict
+
+    """
+    if curve_types is None:
+        curve_types = ["quad", "cubic"] if y_col is None else ["bi_quad", "bi_cub"]
+    for c_type in curve_types:
+        if not c_type in CURVE_EXPONENTS.keys():
+            raise ValueError("Type of curve not yet implemented.")
+
+    # Polynomial terms used by all the curve types
+    terms = {}
+    for c_type in curve_types:
+        for exps in CURVE_EXPONENTS[c_type]:
+            terms.setdefault(tuple(exps), len(terms))
+    exponents = np.array(list(terms.keys()))
+
+    # Sums of the normal equations
+    gram = np.zeros((len(terms), len(terms)))
+    moment = np.zeros(len(terms))
+    out_sum, out_sqr_sum, nb_pts = 0.0, 0.0, 0
+    x_min, x_max, y_min, y_max = np.inf, -np.inf, np.inf, -np.inf
+
+    columns = [col for col in [x_col, y_col, out_col] if col is not None]
+    for chunk in read_measurements(data, columns, chunksize):
+        chunk = chunk.dropna()
+        if len(chunk) == 0:
+            continue
+        x = chunk[x_col].to_numpy(dtype=float)
+        y = np.zeros_like(x) if y_col is None else chunk[y_col].to_numpy(dtype=float)
+        out = chunk[out_col].to_numpy(dtype=float)
+
+        basis = (
+            x[:, np.newaxis] ** exponents[:, 0] * y[:, np.newaxis] ** exponents[:, 1]
+        )
+        gram += basis.T @ basis
+        moment += basis.T @ out
+        out_sum += out.sum()
+        out_sqr_sum += out @ out
+        nb_pts += len(out)
+        x_min, x_max = min(x_min, x.min()), max(x_max, x.max())
+        y_min, y_max = min(y_min, y.min()), max(y_max, y.max())
+
+    if nb_pts == 0:
+        raise ValueError("No measurements found.")
+
+    # Total sum of squares
+    tss = out_sqr_sum - out_sum**2 / nb_pts
+
+    fits = {}
+    for c_type in curve_types:
+        idx = [terms[tuple(exps)] for exps in CURVE_EXPONENTS[c_type]]
+        c_gram, c_moment = gram[np.ix_(idx, idx)], moment[idx]
+
+        # Scale the normal equations to improve their conditioning
+        scales = np.sqrt(np.diag(c_gram))
+        scales[scales == 0] = 1
+        coeffs = (
+            np.linalg.lstsq(
+                c_gram / np.outer(scales, scales), c_moment / scales, rcond=None
+            )[0]
+            / scales
+        )
+
+        # Coefficient of determination
+        rss = max(out_sqr_sum - 2 * coeffs @ c_moment + coeffs @ c_gram @ coeffs, 0)
+        if tss > 0:
+            r_sqr = 1 - rss / tss
+        else:
+            r_sqr = 1.0 if np.isclose(rss, 0) else 0.0
+
+        # Curves are bounded by the range of the measurements
+        curve = Curve(eqp=eqp, c_type=c_type)
+        curve.out_var = out_var
+        curve.coeffs = coeffs
+        curve.x_min, curve.x_max = x_min, x_max
+        if y_col is not None:
+            curve.y_min, curve.y_max = y_min, y_max
+        fits[c_type] = [curve, r_sqr]
+
+    return fits
+
+
+# Distance metrics used to find the nearest neighbors of a target
+DISTANCE_METRICS = ["l1", "l2", "mahalanobis"]
+
+
+def get_grid(vars_range, grid_size=20):
+    """Get a grid of independent variable values.
+
+    :param list vars_range: Minimum and maximum values of each independent variable
+    :param int grid_size: Number of values of each independent variable
+    :return: First and second independent variable values at each point of the grid, 0s are used for the second variable of univariate curves
+    :rtype: tuple
+
+    """
+    input_values = [
+        np.linspace(min_val, max_val, grid_size) for min_val, max_val in vars_range
+    ]
+    if len(input_values) == 1:
+        input_values.append(np.zeros(1))
+    x, y = np.meshgrid(*input_values, indexing="ij")
+    return x.ravel(), y.ravel()
+
+
+def evaluate_curves(curves, x, y):
+    """Return the output of a list of curves, curves of the same type are evaluated at once.
+
+    :param list curves: List of curves
+    :param numpy.array x: First independent variable values
+    :param numpy.array y: Second independent variable values
+    :return: Curves outputs, one row per curve and one column per point
+    :rtype: numpy.array
+
+    """
+    vals = np.zeros((len(curves), len(x)))
+    for c_type in set([c.type for c in curves]):
+        idx = [i for i, c in enumerate(curves) if c.type == c_type]
+        vals[idx] = CurveBatch([curves[i] for i in idx]).evaluate(x, y)
+    return vals
+
 
 class SetsofCurves:
-    def __init__(self, eqp, sets):
+    def __init__(self, eqp, sets, lib=None):
         self.eqp = eqp
         self.eqp_type = eqp.type
         self.sets_of_curves = sets
+        # Library from which the sets of curves were retrieved, its cached
+        # curve outputs are used in aggregations when available
+        self.lib = lib
+        # Cached equipment attributes, see get_attributes()
+        self.attributes = {}
 
     def get_aggregated_set_of_curves(
-        self, method="weighted-average", N=None, ranges={}, misc_attr={}
+        self,
+        method="weighted-average",
+        N=None,
+        ranges={},
+        misc_attr={},
+        grid_size=20,
+        adaptive=False,
+        tol=5e-3,
+        nn_vars=["ref_cap", "full_eff"],
+        nn_metric="l1",
+        nn_weights=None,
     ):
         """Determine sets of curves based on aggregation.
 
+        The aggregated set of curves is associated with the equipment of the sets of curves.
+
         :param str method: Type of aggregation, currently supported: 'average', 'median', 'weighted-average', and 'NN-weighted-average' as in nearest neighbor weighted average.
         :param int N: Number of neighbor used to the aggregation, only used when the method is 'NN-weighted-average'.
         :param dict ranges: Dictionary that defines the ranges of values for each independent variable used to calculate aggregated dependent variable values.
         :param dict misc_attr: Dictionary that provides values for the aggregated set of curves.
+        :param int grid_size: Number of values of each independent variable used to calculate aggregated dependent variable values, maximum number of values if the grid is adaptive.
+        :param bool adaptive: Start with a coarse grid (5 values for each independent variable) and refine it until the coefficients of the aggregated curves stop changing.
+        :param float tol: Tolerance used to determine if the coefficients of the aggregated curves stopped changing, it applies to the resulting change of the curve output relative to the aggregated dependent variable values. Only used if the grid is adaptive.
+        :param list nn_vars: Variables used to determine the weight of each set of curves, see `nearest_neighbor_sort()`
+        :param str nn_metric: Distance metric used to determine the weight of each set of curves, see `nearest_neighbor_sort()`
+        :param list nn_weights: Weights associated with each variable in nn_vars, see `nearest_neighbor_sort()`
         :return: Aggregated set of curves
         :rtype: SetofCurves
 
+        """
+        return self.get_aggregated_sets_of_curves(
+            method=method,
+            N=N,
+            ranges=ranges,
+            misc_attrs=[misc_attr],
+            grid_size=grid_size,
+            adaptive=adaptive,
+            tol=tol,
+            eqps=[self.eqp],
+            nn_vars=nn_vars,
+            nn_metric=nn_metric,
+            nn_weights=nn_weights,
+        )[0]
+
+    def get_target_equipment(self, misc_attr):
+        """Create the equipment associated with an aggregated set of curves.
+
+        The equipment of the sets of curves is copied and its reference capacity and efficiencies are replaced by the ones of the target.
+        The capacity unit of the equipment is kept unless `ref_cap_unit` is specified, efficiencies are COPs unless `ref_eff_unit` is specified, as in `copper.chiller.Chiller.get_seed_curves()`.
+
+        :param dict misc_attr: Dictionary that provides values for the aggregated set of curves.
+        :return: Equipment associated with the aggregated set of curves
+        :rtype: copper.chiller.Chiller
+
+        """
+        eqp = copy.copy(self.eqp)
+        if "ref_cap" in misc_attr.keys():
+            eqp.ref_cap = misc_attr["ref_cap"]
+            if misc_attr.get("ref_cap_unit", ""):
+                eqp.ref_cap_unit = misc_attr["ref_cap_unit"]
+        eff_unit = misc_attr.get("ref_eff_unit", "") or "cop"
+        for eff in ["full_eff", "part_eff"]:
+            if eff in misc_attr.keys():
+                setattr(eqp, eff, misc_attr[eff])
+                setattr(eqp, "{}_unit".format(eff), eff_unit)
+        return eqp
+
+    def get_aggregated_sets_of_curves(
+        self,
+        method="weighted-average",
+        N=None,
+        ranges={},
+        misc_attrs=[],
+        grid_size=20,
+        adaptive=False,
+        tol=5e-3,
+        eqps=None,
+        nn_vars=["ref_cap", "full_eff"],
+        nn_metric="l1",
+        nn_weights=None,
+    ):
+        """Determine sets of curves based on aggregation for several targets at once.
+
+        All targets share the same seed curves and ranges, only the weight of each seed curve differs between targets.
+        The aggregated values of all targets are obtained from a single matrix product and their curves are fitted at once.
+
+        :param str method: Type of aggregation, currently supported: 'average', 'median', 'weighted-average', and 'NN-weighted-average' as in nearest neighbor weighted average.
+        :param int N: Number of neighbor used to the aggregation, only used when the method is 'NN-weighted-average'.
+        :param dict ranges: Dictionary that defines the ranges of values for each independent variable used to calculate aggregated dependent variable values.
+        :param list misc_attrs: List of dictionaries that provide values for each aggregated set of curves.
+        :param int grid_size: Number of values of each independent variable used to calculate aggregated dependent variable values, maximum number of values if the grid is adaptive.
+        :param bool adaptive: Start with a coarse grid (5 values for each independent variable) and refine it until the coefficients of the aggregated curves stop changing.
+        :param float tol: Tolerance used to determine if the coefficients of the aggregated curves stopped changing, it applies to the resulting change of the curve output relative to the aggregated dependent variable values. Only used if the grid is adaptive.
+        :param list eqps: Equipment associated with each aggregated set of curves, see `get_target_equipment()` if not specified
+        :param list nn_vars: Variables used to determine the weight of each set of curves, see `nearest_neighbor_sort()`
+        :param str nn_metric: Distance metric used to determine the weight of each set of curves, see `nearest_neighbor_sort()`
+        :param list nn_weights: Weights associated with each variable in nn_vars, see `nearest_neighbor_sort()`
+        :return: Aggregated sets of curves, one for each target
+        :rtype: list
+
         """
         # Check that all curves are/have:
         # - the same output variables
@@ -69,19 +586,11 @@ class SetsofCurves:
                         "Curve unit mismatch, aggregated set of curves cannot currently be determined."
                     )
 
-        input_values = {}
-        # Determine values of independent variables using the user-specified ranges
-        for c in self.sets_of_curves[0].curves:
-            input_values[c.out_var] = []
-            for vars_rng in ranges[c.out_var]["vars_range"]:
-                min_val, max_val = vars_rng
-                input_values[c.out_var].append(np.linspace(min_val, max_val, 20))
-            # Add 0s for second independent variables for univariate curves
-            if len(input_values[c.out_var]) == 1:
-                input_values[c.out_var].append(np.linspace(0.0, 0.0, 20))
-
-        output_values = {}
-        # Calculate values of dependent variables using the user-specified ranges
+        # Gather the curves used in the aggregation and the factors needed
+        # to scale them to the user-specified normalization point
+        seed_curves = {}
+        seed_names = {}
+        scaling_factors = {}
         for set_of_curves in self.sets_of_curves:
             for c in set_of_curves.curves:
                 if not "normalization" in ranges[c.out_var].keys():
@@ -89,27 +598,7 @@ class SetsofCurves:
                         "Normalization point not provided, the curve cannot be created."
                     )
 
-                # TODO: move assignement to Curve() class and values ot Chiller() class
-                if c.eqp.model == "lct_lwt":
-                    if c.out_var == "eir-f-t":
-                        c.ref_x = c.ref_lwt
-                        c.ref_y = c.ref_lct
-                    if c.out_var == "cap-f-t":
-                        c.ref_x = c.ref_lwt
-                        c.ref_y = c.ref_lct
-                    if c.out_var == "eir-f-plr":
-                        c.ref_x = c.ref_lct
-                        c.ref_y = 1.0  # plr = 1.0
-                elif c.eqp.model == "ect_lwt":
-                    if c.out_var == "eir-f-t":
-                        c.ref_x = c.ref_lwt
-                        c.ref_y = c.ref_ect
-                    if c.out_var == "cap-f-t":
-                        c.ref_x = c.ref_lwt
-                        c.ref_y = c.ref_ect
-                    if c.out_var == "eir-f-plr":
-                        c.ref_x = 1.0  # plr = 1.0
-                        c.ref_y = 0.0  # no dependent variable
+                c.ref_x, c.ref_y = c.get_ref_point()
 
                 norm = ranges[c.out_var]["normalization"]
                 if isinstance(norm, float):
@@ -118,85 +607,61 @@ class SetsofCurves:
                 else:
                     ref_x, ref_y = norm
 
-                output_value = [
-                    c.evaluate(x, y)
-                    * c.evaluate(ref_x, ref_y)
-                    / c.evaluate(c.ref_x, c.ref_y)
-                    for x, y in list(
-                        itertools.product(
-                            input_values[c.out_var][0], input_values[c.out_var][1]
-                        )
-                    )
-                ]
-                if c.out_var in output_values.keys():
-                    output_values[c.out_var].append(output_value)
-                else:
-                    output_values[c.out_var] = []
-                    output_values[c.out_var].append(output_value)
-
-        # Create new set of curves and assign its attributes based on user defined inputs
-        agg_set_of_curves = SetofCurves()
-        for att, att_val in misc_attr.items():
-            setattr(agg_set_of_curves, att, att_val)
-
-        # Determine aggregated values for dependent variables
-        for var, vals in output_values.items():
-            if method == "average":
-                y_s = [list(map(lambda x: sum(x) / len(x), zip(*vals)))]
-            elif method == "median":
-                y_s = [list(map(lambda x: statistics.median(x), zip(*vals)))]
-            elif method == "weighted-average":
-                df, _ = self.nearest_neighbor_sort(target_attr=misc_attr)
-                sorted_vals = list(
-                    map(vals.__getitem__, df.index.values)
-                )  # adding this incase of NaN in dfs
-                y_s = [
-                    list(
-                        map(lambda x: np.dot(df["score"].values, x), zip(*sorted_vals))
-                    )
-                ]
-            elif method == "NN-weighted-average":
-                # first make sure that the user has specified to pick N values
-                try:
-                    assert N is not None
-                except AssertionError:
-                    logging.critical("Need to specify number of nearest neighbors N")
-                df, _ = self.nearest_neighbor_sort(target_attr=misc_attr, N=N)
-                sorted_vals = list(map(vals.__getitem__, df.index.values))
-                y_s = [
-                    list(
-                        map(lambda x: np.dot(df["score"].values, x), zip(*sorted_vals))
-                    )
-                ]
+                seed_curves.setdefault(c.out_var, []).append(c)
+                seed_names.setdefault(c.out_var, []).append(set_of_curves.name)
+                scaling_factors.setdefault(c.out_var, []).append(
+                    c.evaluate(ref_x, ref_y) / c.evaluate(c.ref_x, c.ref_y)
+                )
 
-            data = pd.DataFrame(
-                [
-                    list(xs + (y,))
-                    for xs, y in zip(
-                        list(
-                            itertools.product(
-                                input_values[var][0], input_values[var][1]
-                            )
-                        ),
-                        y_s[0],
-                    )
-                ]
+        if eqps is None:
+            eqps = [self.get_target_equipment(misc_attr) for misc_attr in misc_attrs]
+
+        # Create new sets of curves and assign their attributes based on user defined inputs
+        agg_sets_of_curves = []
+        for misc_attr in misc_attrs:
+            agg_set_of_curves = SetofCurves()
+            for att, att_val in misc_attr.items():
+                setattr(agg_set_of_curves, att, att_val)
+            agg_sets_of_curves.append(agg_set_of_curves)
+
+        # Determine the weight of each set of curves for each target
+        # The weights do not depend on the output variable
+        seed_weights = np.full(
+            (len(misc_attrs), len(self.sets_of_curves)), 1 / len(self.sets_of_curves)
+        )
+        if method == "NN-weighted-average":
+            # first make sure that the user has specified to pick N values
+            try:
+                assert N is not None
+            except AssertionError:
+                logging.critical("Need to specify number of nearest neighbors N")
+        if method == "weighted-average":
+            seed_weights, _ = self.nearest_neighbor_sort(
+                target_attr=list(misc_attrs),
+                vars=nn_vars,
+                metric=nn_metric,
+                weights=nn_weights,
+            )
+        elif method == "NN-weighted-average":
+            seed_weights, _ = self.nearest_neighbor_sort(
+                target_attr=list(misc_attrs),
+                vars=nn_vars,
+                N=N,
+                metric=nn_metric,
+                weights=nn_weights,
             )
-            data.columns = ["X1", "X2", "Y"]
-
-            # Create new curve
-            new_curve = Curve(eqp=self.eqp, c_type="")  # curve type is set later on
-
-            # Assign curve attributes, assume no min/max
-            # TODO: Allow min/max to be passed by user
-            new_curve.out_var = var
-            new_curve.units = self.sets_of_curves[0].curves[0].units
-            new_curve.x_min = -999
-            new_curve.y_min = -999
-            new_curve.x_max = 999
-            new_curve.y_max = 999
-            new_curve.out_min = -999
-            new_curve.out_max = 999
+
+        # Number of values of each independent variable used to
+        # calculate aggregated dependent variable values
+        grid_sizes = [grid_size]
+        if adaptive:
+            grid_sizes = [5]
+            while 2 * grid_sizes[-1] - 1 < grid_size:
+                grid_sizes.append(2 * grid_sizes[-1] - 1)
+            if grid_sizes[-1] != grid_size:
+                grid_sizes.append(grid_size)
+
+        for var, curves in seed_curves.items():
             if not "normalization" in ranges[var].keys():
                 raise ValueError(
                     "Normalization point not provided, the curve cannot be created."
@@ -207,60 +672,200 @@ class SetsofCurves:
                 ref_y = 0
             else:
                 ref_x, ref_y = norm
-            new_curve.ref_x = ref_x
-            new_curve.ref_y = ref_y
-            # TODO: Move following statement to Chiller class
-            if self.eqp_type == "chiller":
-                if agg_set_of_curves.model == "ect_lwt":
-                    self.ref_lwt = ref_y
-                    self.ref_ect = ref_x
-                elif agg_set_of_curves.model == "lct_lwt":
-                    self.ref_lwt = ref_y
-                    self.ref_lct = ref_x
-                else:
-                    raise ValueError("Algorithm not supported.")
 
-            # Find curves coefficients
-            new_curve.regression(data, list(set(avail_types[new_curve.out_var])))
-
-            # Normalize curve to reference point
-            new_curve.normalized(data, ref_x, ref_y)
-
-            agg_set_of_curves.curves.append(new_curve)
+            new_curves = []
+            for agg_set_of_curves, eqp in zip(agg_sets_of_curves, eqps):
+                # Create new curve
+                new_curve = Curve(eqp=eqp, c_type="")  # curve type is set later on
+
+                # Assign curve attributes, assume no min/max
+                # TODO: Allow min/max to be passed by user
+                new_curve.out_var = var
+                new_curve.units = self.sets_of_curves[0].curves[0].units
+                new_curve.x_min = -999
+                new_curve.y_min = -999
+                new_curve.x_max = 999
+                new_curve.y_max = 999
+                new_curve.out_min = -999
+                new_curve.out_max = 999
+                new_curve.ref_x = ref_x
+                new_curve.ref_y = ref_y
+                # TODO: Move following statement to Chiller class
+                if self.eqp_type == "chiller":
+                    if agg_set_of_curves.model == "ect_lwt":
+                        self.ref_lwt = ref_y
+                        self.ref_ect = ref_x
+                    elif agg_set_of_curves.model == "lct_lwt":
+                        self.ref_lwt = ref_y
+                        self.ref_lct = ref_x
+                    else:
+                        raise ValueError("Algorithm not supported.")
+                new_curves.append(new_curve)
+
+            c_types = list(set(avail_types[var]))
+            sign_val = new_curves[0].get_gradient_sign()
+            fits = [None] * len(new_curves)
+            active = np.arange(len(new_curves))
+
+            # A weighted average of curves of the same type is a curve of that
+            # type, its coefficients are the weighted average of the curves
+            # coefficients if none of the curves are bounded over the grid. This is
+            # decided from the bounds of the curves, they are only sampled if
+            # their output bounds could be reached
+            if method != "median" and len(c_types) == 1:
+                used = np.flatnonzero(np.any(seed_weights != 0, axis=0))
+                batch = CurveBatch([curves[idx] for idx in used])
+                factors = np.array(scaling_factors[var])[used]
+                x, y = get_grid(ranges[var]["vars_range"], 2)
+                unbounded = (
+                    np.all(batch.x_min <= x.min())
+                    and np.all(batch.x_max >= x.max())
+                    and np.all(batch.y_min <= y.min())
+                    and np.all(batch.y_max >= y.max())
+                )
+                if unbounded and (
+                    np.any(batch.out_min > -999) or np.any(batch.out_max < 999)
+                ):
+                    vals = None
+                    if self.lib is not None:
+                        _, x, y, vals = self.lib.get_grid_values(
+                            var,
+                            ranges[var],
+                            grid_sizes[-1],
+                            names=[seed_names[var][idx] for idx in used],
+                            curves=[curves[idx] for idx in used],
+                        )
+                    if vals is None:
+                        x, y = get_grid(ranges[var]["vars_range"], grid_sizes[-1])
+                        vals = batch.evaluate(x, y)
+                    else:
+                        vals = vals / factors[:, np.newaxis]
+                    unbounded = np.all(vals > batch.out_min[:, np.newaxis]) and np.all(
+                        vals < batch.out_max[:, np.newaxis]
+                    )
+                if unbounded:
+                    coeffs = seed_weights[:, used] @ (batch.coeffs * factors[:, None])
+                    # Non-monotonic cubic curves are fitted
+                    if (
+                        c_types[0] != "cubic"
+                        or sign_val is None
+                        or all(
+                            is_monotonic_cubic(c_coeffs, sign_val, (x.min(), x.max()))
+                            for c_coeffs in coeffs
+                        )
+                    ):
+                        fits = [(c_types[0], c_coeffs, 1.0) for c_coeffs in coeffs]
+                        active = np.arange(0)
+
+            # Find curves coefficients, refining the grid until the coefficients
+            # stop changing if the grid is adaptive
+            for size in grid_sizes:
+                if len(active) == 0:
+                    break
+
+                # Curves outputs are retrieved from the library if they have been
+                # cached, they are calculated otherwise
+                vals = None
+                if self.lib is not None:
+                    _, x, y, vals = self.lib.get_grid_values(
+                        var, ranges[var], size, names=seed_names[var], curves=curves
+                    )
+                if vals is None:
+                    x, y = get_grid(ranges[var]["vars_range"], size)
+                    vals = evaluate_curves(curves, x, y)
+                    vals *= np.array(scaling_factors[var])[:, np.newaxis]
+
+                # Determine aggregated values for dependent variables
+                if method == "median":
+                    y_s = np.tile(np.median(vals, axis=0), (len(active), 1))
+                else:
+                    y_s = seed_weights[active] @ vals
+                types, coeffs, r_sqrs = fit_curves(x, y, y_s, c_types, sign_val)
+
+                converged = []
+                for idx, (c_type, c_coeffs, r_sqr) in enumerate(
+                    zip(types, coeffs, r_sqrs)
+                ):
+                    if c_type is None:
+                        continue
+                    prev_fit = fits[active[idx]]
+                    fits[active[idx]] = (c_type, c_coeffs, r_sqr)
+
+                    # Effect of the change of the coefficients on the curve output
+                    if prev_fit is not None and prev_fit[0] == c_type:
+                        change = get_basis(c_type, x, y) @ (c_coeffs - prev_fit[1])
+                        if np.abs(change).max() <= tol * np.abs(y_s[idx]).max():
+                            converged.append(idx)
+                active = np.delete(active, converged)
+
+            for agg_set_of_curves, new_curve, fit in zip(
+                agg_sets_of_curves, new_curves, fits
+            ):
+                if fit is not None:
+                    new_curve.set_fit(*fit)
+
+                # Normalize curve to reference point
+                new_curve.normalized(ref_x, ref_y)
+
+                agg_set_of_curves.curves.append(new_curve)
 
         # Determine reference condenser flow rate
         # TODO: Move following statement to Chiller class
         if self.eqp_type == "chiller":
-            self.eqp.set_of_curves = agg_set_of_curves.curves
-            if self.eqp.condenser_type == "water":
-                cond_flow_rate = self.eqp.get_ref_cond_flow_rate()
-                for c in agg_set_of_curves.curves:
-                    c.ref_cond_fluid_flow = cond_flow_rate
-                    c.ref_evap_fluid_flow = 0
+            for agg_set_of_curves, eqp in zip(agg_sets_of_curves, eqps):
+                eqp.set_of_curves = agg_set_of_curves.curves
+                if eqp.condenser_type == "water":
+                    cond_flow_rate = eqp.get_ref_cond_flow_rate()
+                    for c in agg_set_of_curves.curves:
+                        c.ref_cond_fluid_flow = cond_flow_rate
+                        c.ref_evap_fluid_flow = 0
 
-        return agg_set_of_curves
+        return agg_sets_of_curves
 
     def nearest_neighbor_sort(
-        self, target_attr=None, vars=["ref_cap", "full_eff"], N=None
+        self,
+        target_attr=None,
+        vars=["ref_cap", "full_eff"],
+        N=None,
+        epsilon=0.00001,
+        metric="l1",
+        weights=None,
     ):
 
         """This function performs the weighted average and the nearest neighbor approach.
 
-        :param dict target_attr: Target attributes we want to match
+        Several targets can be matched at once by providing a list of target attributes, in which case a matrix
+        of scores and the index of the best sets of curves for each target are returned.
+
+        :param dict target_attr: Target attributes we want to match, or list of target attributes
         :param list vars: The variables we want to use to compute our l2 score. note COP will be added
         :param int N: Indicates the number of nearest neighbors to consider. N=None for weighted-average
+        :param float epsilon: Value added to the standard deviation of each variable when they are normalized
+        :param str metric: Distance metric used to compare the normalized variables: `l1`, `l2`, or `mahalanobis`, see `get_distances()`
+        :param list weights: Weights associated with each variable in vars, 1/len(vars) by default
         :param pandas.DataFrame df: Pandas dataframe with selected chiller names and the associated weightings
-        :return: Index of set_of_curve that should be the closest fit
+        :return: Index of set_of_curve that should be the closest fit. For a list of targets, scores of each set of curves (one row per target, one column per set of curves) and index of the sets of curves considered for each target, sorted by decreasing score
         :rtype: int
 
         """
 
         if target_attr is None:
             raise ValueError("target_attr cannot be None. Enter valid attributes")
+        target_attrs = target_attr
+        if not isinstance(target_attr, (list, tuple)):
+            target_attrs = [target_attr]
+        if not metric in DISTANCE_METRICS:
+            raise ValueError(
+                f"Metric {metric} not supported, supported metrics are: {', '.join(DISTANCE_METRICS)}."
+            )
 
-        vars_not_in_dict = self.check_vars_in_dictionary(
-            vars=vars, target_attr=target_attr
-        )
+        vars_not_in_dict = []
+        for attr in target_attrs:
+            vars_not_in_dict += [
+                var
+                for var in self.check_vars_in_dictionary(vars=vars, target_attr=attr)
+                if not var in vars_not_in_dict
+            ]
 
         try:
             assert not vars_not_in_dict
@@ -271,40 +876,117 @@ class SetsofCurves:
             )
             raise
 
-        df_list = []
-        data = {}
-
-        if target_attr is None:
-            logging.error("Enter valid attributes. Returning Empty DataFrame")
-            df = pd.DataFrame
-            best_idx = None
+        attributes = self.get_attributes(vars)
+        values = attributes["values"]
+        rows = np.flatnonzero(attributes["valid"])
+
+        # check if there is only a single curve.
+        # in that case, we select that curve, even if there ar NaN values
+        targets = np.array(
+            [[attr[var] for var in vars] for attr in target_attrs], dtype=float
+        ).reshape(len(target_attrs), len(vars))
+        if len(values) == 1 and len(rows) == 0:
+            rows = np.array([0])
+            values = targets[:1]
+        assert len(rows) > 0
+        values = values[rows]
+
+        if len(rows) == 1:
+            norm_values = np.ones(values.shape)
+            top = np.zeros((len(targets), 1), dtype=int)
+            x = np.zeros((len(targets), 1))
         else:
-            for setofcurve in self.sets_of_curves:
-                data["name"] = [setofcurve.name]
-                for var in vars:
-                    data[var] = [setofcurve.eqp.__dict__[var]]
-                df_list.append(pd.DataFrame(data))
-            df = pd.concat(df_list)
-
-            # check if there is only a single curve.
-            # in that case, we select that curve, even if there ar NaN values
-            if len(df) == 1 and len(df.dropna()) == 0:
-                for var in vars:
-                    df[var] = target_attr[var]
-            else:
-                df = df.dropna()
-            assert len(df) > 0
+            # Standardize the attributes and compute the distances
+            # of all the targets at once
+            scale = attributes["std"] + epsilon
+            norm_values = (values - attributes["mean"]) / scale
+            norm_targets = (targets - attributes["mean"]) / scale
+            x = -self.get_distances(norm_values, norm_targets, metric, weights)
+
+            # first pick top N candidate and sort them
+            top = np.tile(np.arange(len(rows)), (len(targets), 1))
+            if N is not None and N < len(rows):
+                top = np.argpartition(-x, N - 1, axis=1)[:, :N]
+            top = np.take_along_axis(
+                top,
+                np.argsort(-np.take_along_axis(x, top, axis=1), axis=1, kind="stable"),
+                axis=1,
+            )
+            x = np.take_along_axis(x, top, axis=1)
+        scores = np.zeros((len(targets), len(self.sets_of_curves)))
+        np.put_along_axis(scores, rows[top], self.softmax(x, axis=1), axis=1)
+
+        if isinstance(target_attr, (list, tuple)):
+            return scores, rows[top]
+
+        # Candidates are sorted by decreasing score if only the top N are considered
+        if N is None:
+            top = np.arange(len(rows))[np.newaxis, :]
+        data = {"name": [self.sets_of_curves[idx].name for idx in rows[top[0]]]}
+        for var_idx, var in enumerate(vars):
+            data[var] = values[top[0], var_idx]
+        for var_idx, var in enumerate(vars):
+            data[var + "_norm"] = norm_values[top[0], var_idx]
+        data["score"] = scores[0, rows[top[0]]]
+        df = pd.DataFrame(data, index=rows[top[0]])
+        best_idx = rows[top[0][np.argmax(data["score"])]]
+
+        return df, best_idx
+
+    def get_attributes(self, vars):
+        """Get the attributes of the equipment of each set of curves.
+
+        The attributes are stored in a matrix and cached the first time they are requested for a list of sets of curves.
+        The statistics are retrieved from the attribute index of the library from which the sets of curves were retrieved, if any,
+        when the library values match the attributes of the equipment.
+
+        :param list vars: Names of the attributes
+        :return: Dictionary containing the values of the attributes (one row per set of curves, NaN if missing), which sets of curves have all the attributes, and the mean and standard deviation of each attribute over these sets of curves
+        :rtype: dict
 
-            if N is not None:
-                df, target_attr, best_idx = self.normalize_vars(
-                    df=df, target_attr=target_attr, N=N, vars=vars
+        """
+        key = tuple(vars)
+        attributes = self.attributes.get(key)
+        if (
+            attributes is None
+            or len(attributes["sets"]) != len(self.sets_of_curves)
+            or not all(
+                [a is b for a, b in zip(attributes["sets"], self.sets_of_curves)]
+            )
+        ):
+            values = np.array(
+                [
+                    [set_of_curves.eqp.__dict__[var] for var in vars]
+                    for set_of_curves in self.sets_of_curves
+                ],
+                dtype=float,
+            ).reshape(len(self.sets_of_curves), len(vars))
+            valid = ~np.isnan(values).any(axis=1)
+            names = [set_of_curves.name for set_of_curves in self.sets_of_curves]
+            if (
+                self.lib is not None
+                and all([name in self.lib.data.keys() for name in names])
+                and np.array_equal(
+                    self.lib.get_attribute_values(names, vars), values, equal_nan=True
                 )
+            ):
+                # Use the statistics of the attribute index of the library, the
+                # equipment may have been modified since they were retrieved
+                mean, std = self.lib.get_attribute_stats(names, vars)
             else:
-                df, target_attr, best_idx = self.normalize_vars(
-                    df=df, target_attr=target_attr, vars=vars
-                )
-
-        return df, best_idx
+                mean, std = np.full(len(vars), np.nan), np.full(len(vars), np.nan)
+                if valid.sum() > 1:
+                    mean = values[valid].mean(axis=0)
+                    std = values[valid].std(axis=0, ddof=1)
+            attributes = {
+                "sets": list(self.sets_of_curves),
+                "values": values,
+                "valid": valid,
+                "mean": mean,
+                "std": std,
+            }
+            self.attributes[key] = attributes
+        return attributes
 
     def normalize_vars(
         self,
@@ -314,6 +996,7 @@ class SetsofCurves:
         epsilon=0.00001,
         weights=None,
         N=None,
+        metric="l1",
     ):
 
         """Normalize curve outputs.
@@ -323,6 +1006,7 @@ class SetsofCurves:
         :param list vars: List of strings for variables we want to normalize
         :param list weights: Weights associated with each variable in vars
         :param int N: Number of nearest neighbors. It should be none unless method is 'NN-weighted-average'
+        :param str metric: Distance metric: `l1`, `l2`, or `mahalanobis`, see `get_distances()`
         :return: Dataframe with added columns with normalized variables, dict with added normalized values of var in vars, index of the best curve
         :rtype: list
 
@@ -348,8 +1032,14 @@ class SetsofCurves:
                 )
                 target_attr[var_name] = None
 
-        # compute the l2 norm
-        x = -self.l2_norm(df=df, target_attr=target_attr, weights=weights, vars=vars)
+        # compute the distances
+        norm_vars = [var + "_norm" for var in vars]
+        x = -self.get_distances(
+            df[norm_vars].values,
+            [target_attr[var] for var in norm_vars],
+            metric,
+            weights,
+        )[0]
 
         if len(df) == 1:
             df["score"] = 1
@@ -370,7 +1060,7 @@ class SetsofCurves:
 
     def l2_norm(self, df, target_attr, weights, vars=["full_eff", "ref_cap"]):
 
-        """Perform L2 normalization.
+        """Compute the weighted sum of the absolute differences (L1 distance) between normalized variables, see `get_distances()` for other metrics.
 
         :param pandas.DataFrame df: Dataframe containing the attributes of different equipments for a given equipment type
         :param dict target_attr: Target equipment attribute
@@ -388,15 +1078,56 @@ class SetsofCurves:
 
         return Y
 
-    def softmax(self, x):
+    def get_distances(self, values, targets, metric="l1", weights=None):
+        """Compute the weighted distances between normalized variables of sets of curves and targets.
+
+        - `l1`: sum of the weighted absolute differences
+        - `l2`: square root of the sum of the weighted squared differences
+        - `mahalanobis`: `l2` distance accounting for the covariance of the variables of the sets of curves, the differences are scaled by the square root of the weights
+
+        :param numpy.array values: Normalized variables of the sets of curves, one row per set of curves
+        :param numpy.array targets: Normalized variables of the targets, one row per target
+        :param str metric: Distance metric: `l1`, `l2`, or `mahalanobis`
+        :param list weights: Weights associated with each variable, 1/len(vars) by default
+        :return: Distances, one row per target and one column per set of curves
+        :rtype: numpy.array
+
+        """
+        values = np.atleast_2d(np.asarray(values, dtype=float))
+        targets = np.atleast_2d(np.asarray(targets, dtype=float))
+        nb_vars = values.shape[1]
+        if weights is None:
+            weights = np.full(nb_vars, 1.0 / nb_vars)
+        weights = np.asarray(weights, dtype=float)
+        if weights.shape != (nb_vars,):
+            raise ValueError("One weight should be provided for each variable.")
+
+        diff = values[np.newaxis, :, :] - targets[:, np.newaxis, :]
+        if metric == "l1":
+            return np.abs(diff) @ weights
+        elif metric == "l2":
+            return np.sqrt(diff**2 @ weights)
+        elif metric == "mahalanobis":
+            diff = diff * np.sqrt(weights)
+            inv_cov = np.linalg.pinv(np.atleast_2d(np.cov(values, rowvar=False)))
+            return np.sqrt(
+                np.maximum(np.einsum("tni,ij,tnj->tn", diff, inv_cov, diff), 0)
+            )
+        raise ValueError(
+            f"Metric {metric} not supported, supported metrics are: {', '.join(DISTANCE_METRICS)}."
+        )
+
+    def softmax(self, x, axis=0):
         """Softmax function.
 
         :param float x: Convert distances to scores/weights using the softmax function
+        :param int axis: Axis along which the softmax function is applied
         :return: Result of the softmax function
         :rtype: float
 
         """
-        return np.exp(x) / np.sum(np.exp(x), axis=0)
+        x = np.asarray(x, dtype=float)
+        return np.exp(x) / np.sum(np.exp(x), axis=axis, keepdims=True)
 
     def check_vars_in_dictionary(self, vars, target_attr):
         """Function to check that the vars specified by the user exists in 'target_attr'.
@@ -416,11 +1147,55 @@ class SetsofCurves:
 
 
 class SetofCurves:
+    # Attributes that are not listed here, such as the ones
+    # describing an aggregated set of curves, are stored in misc_attr
+    __slots__ = ("name", "curves", "eqp", "misc_attr")
+
     def __init__(self):
+        self.misc_attr = {}
         self.name = ""
         self.curves = []
         self.eqp = ""
 
+    def __getattr__(self, att):
+        if att == "misc_attr":
+            raise AttributeError(att)
+        try:
+            return self.misc_attr[att]
+        except KeyError:
+            raise AttributeError(
+                "'SetofCurves' object has no attribute '{}'".format(att)
+            )
+
+    def __setattr__(self, att, val):
+        if att in SetofCurves.__slots__:
+            object.__setattr__(self, att, val)
+        else:
+            self.misc_attr[att] = val
+
+    def copy(self):
+        """Copy a set of curves, the curves are copied but the equipment is shared.
+
+        :return: Copy of the set of curves
+        :rtype: SetofCurves
+
+        """
+        new_set_of_curves = SetofCurves.__new__(SetofCurves)
+        object.__setattr__(new_set_of_curves, "misc_attr", dict(self.misc_attr))
+        object.__setattr__(new_set_of_curves, "name", self.name)
+        object.__setattr__(new_set_of_curves, "eqp", self.eqp)
+        object.__setattr__(new_set_of_curves, "curves", [c.copy() for c in self.curves])
+        return new_set_of_curves
+
+    def convert_coefficients(self, units):
+        """Convert the coefficients and bounds of all the curves of the set to a new unit system.
+
+        :param str units: Unit system to convert to: `si` or `ip`
+
+        """
+        for curve in self.curves:
+            curve.convert_coefficients(units)
+
     def get_data_for_plotting(self, curve, norm):
         """Retrieve equipment specific data for plotting set of curves.
 
@@ -443,34 +1218,50 @@ class SetofCurves:
         else:
             x_2_vals = [0]
 
-        y = []
-        for v in range(nb_vals):
-            if "x2_min" in self.eqp.plotting_range[var].keys():
-                norm_fac = (
-                    curve.evaluate(
-                        self.eqp.plotting_range[var]["x1_norm"],
-                        self.eqp.plotting_range[var]["x2_norm"],
-                    )
-                    if norm
-                    else 1
+        if "x2_min" in self.eqp.plotting_range[var].keys():
+            norm_fac = (
+                curve.evaluate(
+                    self.eqp.plotting_range[var]["x1_norm"],
+                    self.eqp.plotting_range[var]["x2_norm"],
                 )
-                y_val = curve.evaluate(x_1_vals[v], x_2_vals[v]) / norm_fac
-            else:
-                norm_fac = (
-                    curve.evaluate(
-                        self.eqp.plotting_range[var]["x1_norm"],
-                        self.eqp.plotting_range[var]["x1_norm"],
-                    )
-                    if norm
-                    else 1
+                if norm
+                else 1
+            )
+            y = curve.evaluate_array(x_1_vals, x_2_vals) / norm_fac
+        else:
+            norm_fac = (
+                curve.evaluate(
+                    self.eqp.plotting_range[var]["x1_norm"],
+                    self.eqp.plotting_range[var]["x1_norm"],
                 )
-                y_val = curve.evaluate(x_1_vals[v], x_1_vals[v]) / norm_fac
-            y.append(y_val)
+                if norm
+                else 1
+            )
+            y = curve.evaluate_array(x_1_vals, x_1_vals) / norm_fac
 
         x = x_1_vals if len(set(x_1_vals)) > len(set(x_2_vals)) else x_2_vals
 
         return [x, y]
 
+    def evaluate_grid(self, values):
+        """Return the output of each curve of the set over a grid of independent variables.
+
+        :param dict values: Values of the independent variables for each output variable, e.g. `{"eir-f-t": [lwt_values, ect_values], "eir-f-plr": [plr_values]}`
+        :return: Curve outputs for each output variable, see `Curve.evaluate_grid()`
+        :rtype: dict
+
+        """
+        grids = {}
+        for curve in self.curves:
+            if not curve.out_var in values.keys():
+                raise ValueError(
+                    "Values of the independent variables not provided for {}.".format(
+                        curve.out_var
+                    )
+                )
+            grids[curve.out_var] = curve.evaluate_grid(*values[curve.out_var])
+        return grids
+
     def plot(self, out_var=[], axes=[], norm=True, color="Black", alpha=0.3):
         """Plot a set of curves.
 
@@ -564,9 +1355,7 @@ class SetofCurves:
                 filen.write(curve_export)
                 curve_export = ""
             elif fmt == "json":
-                c = curve.__dict__
-                c.pop("eqp")
-                curve_export[name].append(c)
+                curve_export[name].append(curve.to_dict())
         if fmt == "json":
             with open(os.path.join(path, f"{name}.json"), "w", encoding="utf-8") as f:
                 json.dump(curve_export, f, indent=4)
@@ -599,7 +1388,232 @@ class SetofCurves:
         return curves
 
 
+def get_derivative_exponents(c_type, var):
+    """Get the factors and exponents of the terms of the partial derivative of a curve type polynomial.
+
+    :param str c_type: Copper curve type
+    :param str var: Independent variable used for the derivation: `x` or `y`
+    :return: Factor applied to each curve coefficient and exponents of the independent variables of each term
+    :rtype: list
+
+    """
+    if not c_type in CURVE_EXPONENTS.keys():
+        raise ValueError("Type of curve not yet implemented.")
+    col = {"x": 0, "y": 1}[var]
+    exponents = CURVE_EXPONENTS[c_type].copy()
+    factors = exponents[:, col].astype(float)
+    exponents[:, col] = np.maximum(exponents[:, col] - 1, 0)
+    return [factors, exponents]
+
+
+# Affine substitutions of the independent variables of curves used to convert
+# their coefficients: x_from = scale * x_to + offset
+UNITS_SUBSTITUTIONS = {
+    "ip": {"temperature": (5 / 9, -160 / 9), "temperature_difference": (5 / 9, 0.0)},
+    "si": {"temperature": (9 / 5, 32.0), "temperature_difference": (9 / 5, 0.0)},
+}
+
+
+def get_independent_variables(out_var, c_type, model=None):
+    """Get the physical quantity represented by each independent variable of a curve.
+
+    :param str out_var: Output variable of the curve, e.g. `eir-f-t`
+    :param str c_type: Copper curve type
+    :param str model: Equipment model, e.g. `ect_lwt` or `lct_lwt`
+    :return: Physical quantity of the first and second independent variables: `temperature`, `temperature_difference`, or None if dimensionless
+    :rtype: list
+
+    """
+    if "f-t" in out_var:
+        return ["temperature", "temperature"]
+    if out_var == "eir-f-plr-dt":
+        return [None, "temperature_difference"]
+    if out_var == "eir-f-plr" and "bi" in c_type:
+        if model == "lct_lwt":
+            return ["temperature", None]
+        return [None, "temperature_difference"]
+    return [None, None]
+
+
+def get_substitution_matrix(
+    c_type, x_scale=1.0, x_offset=0.0, y_scale=1.0, y_offset=0.0
+):
+    """Get the matrix transforming the coefficients of a curve type when its independent variables are substituted by affine functions.
+
+    The polynomial q(u, v) = p(x_scale * u + x_offset, y_scale * v + y_offset) has coefficients M * c, c being the coefficients of p.
+
+    :param str c_type: Copper curve type
+    :param float x_scale: Scale of the first independent variable
+    :param float x_offset: Offset of the first independent variable
+    :param float y_scale: Scale of the second independent variable
+    :param float y_offset: Offset of the second independent variable
+    :return: Substitution matrix
+    :rtype: numpy.array
+
+    """
+    if not c_type in CURVE_EXPONENTS.keys():
+        raise ValueError("Type of curve not yet implemented.")
+    exponents = CURVE_EXPONENTS[c_type]
+    terms = {tuple(exps): idx for idx, exps in enumerate(exponents)}
+    m = np.zeros((len(exponents), len(exponents)))
+    for col, (ex, ey) in enumerate(exponents):
+        # Binomial expansion of (x_scale * u + x_offset)^ex * (y_scale * v + y_offset)^ey
+        for i in range(ex + 1):
+            for j in range(ey + 1):
+                m[terms[(i, j)], col] += (
+                    math.comb(ex, i)
+                    * x_scale**i
+                    * x_offset ** (ex - i)
+                    * math.comb(ey, j)
+                    * y_scale**j
+                    * y_offset ** (ey - j)
+                )
+    return m
+
+
+def get_conversion_matrix(c_type, var_types, units):
+    """Get the matrix converting the coefficients of a curve type to a new unit system.
+
+    :param str c_type: Copper curve type
+    :param list var_types: Physical quantity of each independent variable, see `get_independent_variables()`
+    :param str units: Unit system to convert to: `si` or `ip`
+    :return: Conversion matrix
+    :rtype: numpy.array
+
+    """
+    if not units in UNITS_SUBSTITUTIONS.keys():
+        raise ValueError("Units {} not supported, use 'si' or 'ip'.".format(units))
+    subs = []
+    for var_type in var_types:
+        subs += UNITS_SUBSTITUTIONS[units].get(var_type, (1.0, 0.0))
+    return get_substitution_matrix(c_type, *subs)
+
+
+def convert_variable(val, var_type, units):
+    """Convert the value of an independent variable of a curve, e.g. a bound, to a new unit system.
+
+    Nulls, -999 and 999 are not converted.
+
+    :param float val: Value of the independent variable
+    :param str var_type: Physical quantity of the independent variable, see `get_independent_variables()`
+    :param str units: Unit system to convert to: `si` or `ip`
+    :return: Converted value
+    :rtype: float
+
+    """
+    if val is None or abs(val) == 999 or var_type is None:
+        return val
+    if var_type == "temperature":
+        if units == "ip":
+            return Units(val, "degC").conversion("degF")
+        return Units(val, "degF").conversion("degC")
+    return val * 9 / 5 if units == "ip" else val * 5 / 9
+
+
+def coeff_property(idx):
+    """Create a property giving access to a single curve coefficient, e.g. `coeff1`.
+
+    :param int idx: Coefficient number, starting at 1
+    :return: Coefficient property
+    :rtype: property
+
+    """
+
+    def getter(self):
+        if idx > len(self.coeffs):
+            raise AttributeError(
+                "'Curve' object has no attribute 'coeff{}'".format(idx)
+            )
+        return self.coeffs[idx - 1]
+
+    def setter(self, val):
+        coeffs = np.append(self.coeffs, np.zeros(max(idx - len(self.coeffs), 0)))
+        coeffs[idx - 1] = val
+        self.coeffs = coeffs
+
+    return property(getter, setter)
+
+
+def bound_property(var, side):
+    """Create a property giving access to a curve bound, e.g. `x_min`.
+
+    The bounds used to evaluate the curve, where nulls are replaced
+    by -999 and 999, are updated when the property is set.
+
+    :param str var: Bounded variable: `x`, `y`, or `out`
+    :param str side: Side of the bound: `min` or `max`
+    :return: Bound property
+    :rtype: property
+
+    """
+    att = "_{}_{}".format(var, side)
+
+    def getter(self):
+        return getattr(self, att)
+
+    def setter(self, val):
+        object.__setattr__(self, att, val)
+        val_min = getattr(self, "_{}_min".format(var), None)
+        val_max = getattr(self, "_{}_max".format(var), None)
+        object.__setattr__(
+            self,
+            "_{}_bounds".format(var),
+            (
+                -999 if val_min is None else val_min,
+                999 if val_max is None else val_max,
+            ),
+        )
+
+    return property(getter, setter)
+
+
 class Curve:
+    __slots__ = (
+        "eqp",
+        "out_var",
+        "type",
+        "units",
+        "_x_min",
+        "_y_min",
+        "_x_max",
+        "_y_max",
+        "_out_min",
+        "_out_max",
+        "_x_bounds",
+        "_y_bounds",
+        "_out_bounds",
+        "ref_x",
+        "ref_y",
+        "_coeffs",
+        "_coeff_values",
+        "covariance",
+        "ref_evap_fluid_flow",
+        "ref_cond_fluid_flow",
+        "ref_lwt",
+        "ref_ect",
+        "ref_lct",
+    )
+
+    # Curve attributes, not including its coefficients and equipment
+    _attributes = (
+        "out_var",
+        "type",
+        "units",
+        "x_min",
+        "y_min",
+        "x_max",
+        "y_max",
+        "out_min",
+        "out_max",
+        "ref_x",
+        "ref_y",
+        "ref_evap_fluid_flow",
+        "ref_cond_fluid_flow",
+        "ref_lwt",
+        "ref_ect",
+        "ref_lct",
+    )
+
     def __init__(self, eqp, c_type):
         # General charactersitics
         self.eqp = eqp
@@ -614,33 +1628,8 @@ class Curve:
         self.out_max = None
         self.ref_x = 0
         self.ref_y = 0
-        if self.type == "quad":
-            self.coeff1 = 0
-            self.coeff2 = 0
-            self.coeff3 = 0
-        elif self.type == "cubic":
-            self.coeff1 = 0
-            self.coeff2 = 0
-            self.coeff3 = 0
-            self.coeff4 = 0
-        elif self.type == "bi_quad":
-            self.coeff1 = 0
-            self.coeff2 = 0
-            self.coeff3 = 0
-            self.coeff4 = 0
-            self.coeff5 = 0
-            self.coeff6 = 0
-        elif self.type == "bi_cub":
-            self.coeff1 = 0
-            self.coeff2 = 0
-            self.coeff3 = 0
-            self.coeff4 = 0
-            self.coeff5 = 0
-            self.coeff6 = 0
-            self.coeff7 = 0
-            self.coeff8 = 0
-            self.coeff9 = 0
-            self.coeff10 = 0
+        self.coeffs = np.zeros(len(CURVE_EXPONENTS.get(self.type, [])))
+        self.covariance = None
 
         # Equipment specific charactertics
         # TODO: move under a function in the Chiller class
@@ -662,67 +1651,244 @@ class Curve:
                 else:
                     self.ref_ect = 35.0
 
+    def __getstate__(self):
+        state = {
+            att: getattr(self, att) for att in self._attributes if hasattr(self, att)
+        }
+        state["eqp"] = self.eqp
+        state["coeffs"] = self.coeffs
+        state["covariance"] = getattr(self, "covariance", None)
+        return state
+
+    def __setstate__(self, state):
+        """Restore a pickled curve, coefficients stored as individual attributes are converted."""
+        state = dict(state)
+        ids = sorted(
+            [
+                int(key.split("coeff")[-1])
+                for key in state.keys()
+                if "coeff" in key and key != "coeffs"
+            ]
+        )
+        coeffs = [state.pop("coeff{}".format(idx)) for idx in ids]
+        if not "coeffs" in state.keys():
+            state["coeffs"] = np.array(coeffs, dtype=float)
+        for att in ["x", "y", "out"]:
+            for side in ["min", "max"]:
+                setattr(self, "{}_{}".format(att, side), None)
+        self.covariance = None
+        for att, val in state.items():
+            setattr(self, att, val)
+
+    def copy(self):
+        """Copy a curve, the equipment and the coefficients, which cannot be modified in place, are shared.
+
+        :return: Copy of the curve
+        :rtype: Curve
+
+        """
+        new_curve = Curve.__new__(Curve)
+        for att in Curve.__slots__:
+            try:
+                setattr(new_curve, att, getattr(self, att))
+            except AttributeError:
+                pass
+        if getattr(self, "covariance", None) is not None:
+            new_curve.covariance = self.covariance.copy()
+        return new_curve
+
+    def to_dict(self):
+        """Convert a curve to a dictionary, the equipment is not included.
+
+        :return: Curve attributes and coefficients
+        :rtype: dict
+
+        """
+        c = {att: getattr(self, att) for att in self._attributes if hasattr(self, att)}
+        for idx in range(1, self.nb_coeffs() + 1):
+            c["coeff{}".format(idx)] = getattr(self, "coeff{}".format(idx))
+        return c
+
+    @property
+    def coeffs(self):
+        """Curve coefficients, the array cannot be modified in place and should be set again instead.
+
+        :return: Curve coefficients
+        :rtype: numpy.array
+
+        """
+        return self._coeffs
+
+    @coeffs.setter
+    def coeffs(self, val):
+        coeffs = np.array(val, dtype=float)
+        coeffs.setflags(write=False)
+        self._coeffs = coeffs
+        # Coefficients used for scalar evaluations, see evaluate()
+        self._coeff_values = None
+
+    def get_coeff_values(self):
+        """Get the curve coefficients as Python floats, they are cached until the coefficients are set again.
+
+        :return: Curve coefficients
+        :rtype: tuple
+
+        """
+        if self._coeff_values is None:
+            self._coeff_values = tuple(self._coeffs.tolist())
+        return self._coeff_values
+
     def evaluate(self, x, y):
         """Return the output of a curve.
 
+        Use `evaluate_array()` for arrays of independent variables. The curve is evaluated by the numba kernel
+        when it is the selected backend, see `copper.kernels`; the Python backend uses the equivalent inline
+        expressions below since calling the Python kernel would only add overhead.
+
         :param float x: First curve independent variable
         :param float y: Second curve independent variable
         :return: Curve output
         :rtype: float
 
         """
-        # Catch nulls
-        if self.out_min is None:
-            self.out_min = -999
-        if self.out_max is None:
-            self.out_max = 999
-        if self.x_min is None:
-            self.x_min = -999
-        if self.x_max is None:
-            self.x_max = 999
-        if self.y_min is None:
-            self.y_min = -999
-        if self.y_max is None:
-            self.y_max = 999
+        if kernels.get_backend() == "numba":
+            return kernels.evaluate_curve(*self.get_kernel_args(), x, y)
+
+        # Arithmetic on Python floats is faster than NumPy for a single point
+        c = self.get_coeff_values()
 
-        x = min(max(x, self.x_min), self.x_max)
-        y = min(max(y, self.y_min), self.y_max)
+        x_min, x_max = self._x_bounds
+        y_min, y_max = self._y_bounds
+        x = min(max(x, x_min), x_max)
+        y = min(max(y, y_min), y_max)
 
         if self.type == "bi_quad":
             out = (
-                self.coeff1
-                + self.coeff2 * x
-                + self.coeff3 * x**2
-                + self.coeff4 * y
-                + self.coeff5 * y**2
-                + self.coeff6 * x * y
-            )
-            return min(max(out, self.out_min), self.out_max)
-        if self.type == "bi_cub":
-            out = (
-                self.coeff1
-                + self.coeff2 * x
-                + self.coeff3 * x**2
-                + self.coeff4 * y
-                + self.coeff5 * y**2
-                + self.coeff6 * x * y
-                + self.coeff7 * x**3
-                + self.coeff8 * y**3
-                + self.coeff9 * y * x**2
-                + self.coeff10 * x * y**2
+                c[0]
+                + c[1] * x
+                + c[2] * x**2
+                + c[3] * y
+                + c[4] * y**2
+                + c[5] * x * y
             )
-            return min(max(out, self.out_min), self.out_max)
-        if self.type == "quad":
-            out = self.coeff1 + self.coeff2 * x + self.coeff3 * x**2
-            return min(max(out, self.out_min), self.out_max)
-        if self.type == "cubic":
+        elif self.type == "bi_cub":
             out = (
-                self.coeff1
-                + self.coeff2 * x
-                + self.coeff3 * x**2
-                + self.coeff4 * x**3
+                c[0]
+                + c[1] * x
+                + c[2] * x**2
+                + c[3] * y
+                + c[4] * y**2
+                + c[5] * x * y
+                + c[6] * x**3
+                + c[7] * y**3
+                + c[8] * y * x**2
+                + c[9] * x * y**2
             )
-            return min(max(out, self.out_min), self.out_max)
+        elif self.type == "quad":
+            out = c[0] + c[1] * x + c[2] * x**2
+        elif self.type == "cubic":
+            out = c[0] + c[1] * x + c[2] * x**2 + c[3] * x**3
+        else:
+            raise ValueError("Type of curve not yet implemented.")
+
+        out_min, out_max = self._out_bounds
+        return min(max(out, out_min), out_max)
+
+    def get_kernel_args(self):
+        """Get the arguments describing a curve in the numerical kernels, see `copper.kernels`.
+
+        :return: Curve coefficients, exponents of the independent variables, and bounds (x_min, x_max, y_min, y_max, out_min, out_max)
+        :rtype: tuple
+
+        """
+        if not self.type in KERNEL_EXPONENTS.keys():
+            raise ValueError("Type of curve not yet implemented.")
+
+        # Bounds, nulls are replaced when the bounds are set
+        bounds = tuple(
+            [float(val) for val in self._x_bounds + self._y_bounds + self._out_bounds]
+        )
+        return self.get_coeff_values(), KERNEL_EXPONENTS[self.type], bounds
+
+    def evaluate_array(self, x, y):
+        """Return the output of a curve for arrays of independent variables.
+
+        :param numpy.array x: First curve independent variable values
+        :param numpy.array y: Second curve independent variable values
+        :return: Curve outputs
+        :rtype: numpy.array
+
+        """
+        return self.evaluate_basis(self.get_basis(x, y))
+
+    def evaluate_grid(self, x_values, y_values=None):
+        """Return the output of a curve over a grid of independent variables.
+
+        :param numpy.array x_values: Values of the first curve independent variable
+        :param numpy.array y_values: Values of the second curve independent variable, not needed for univariate curves
+        :return: Curve outputs, one row per value of the first variable and one column per value of the second variable
+        :rtype: numpy.array
+
+        """
+        if not self.type in CURVE_EXPONENTS.keys():
+            raise ValueError("Type of curve not yet implemented.")
+        if y_values is None:
+            y_values = [0.0]
+
+        # Bounds, nulls are replaced when the bounds are set
+        x = np.clip(np.asarray(x_values, dtype=float).ravel(), *self._x_bounds)
+        y = np.clip(np.asarray(y_values, dtype=float).ravel(), *self._y_bounds)
+
+        # The polynomial is separable: sum(c_ij * x^i * y^j) = X * C * Y^T
+        exponents = CURVE_EXPONENTS[self.type]
+        coeffs = np.zeros(exponents.max(axis=0) + 1)
+        np.add.at(coeffs, (exponents[:, 0], exponents[:, 1]), self.coeffs)
+        x_pow = np.vander(x, coeffs.shape[0], increasing=True)
+        y_pow = np.vander(y, coeffs.shape[1], increasing=True)
+        return np.clip(x_pow @ coeffs @ y_pow.T, *self._out_bounds)
+
+    def get_basis(self, x, y):
+        """Compute the polynomial terms of a curve, the independent variables are limited to the curve bounds.
+
+        :param numpy.array x: First curve independent variable values
+        :param numpy.array y: Second curve independent variable values
+        :return: Polynomial terms, the last dimension corresponds to the curve coefficients
+        :rtype: numpy.array
+
+        """
+        # Bounds, nulls are replaced when the bounds are set
+        x_min, x_max = self._x_bounds
+        y_min, y_max = self._y_bounds
+
+        x, y = np.broadcast_arrays(
+            np.clip(np.asarray(x, dtype=float), x_min, x_max),
+            np.clip(np.asarray(y, dtype=float), y_min, y_max),
+        )
+        return get_basis(self.type, x, y)
+
+    def evaluate_basis(self, basis):
+        """Return the output of a curve using precomputed polynomial terms.
+
+        :param numpy.array basis: Polynomial terms, as returned by `get_basis()`
+        :return: Curve outputs
+        :rtype: numpy.array
+
+        """
+        out_min, out_max = self._out_bounds
+        return np.clip(np.dot(basis, self.coeffs), out_min, out_max)
+
+    def evaluate_terms(self, terms):
+        """Return the output of a curve for a single point using precomputed polynomial terms.
+
+        :param list terms: Polynomial terms, as returned by `get_basis()` for a single point
+        :return: Curve output
+        :rtype: float
+
+        """
+        c = self.get_coeff_values()
+        out = sum([coeff * term for coeff, term in zip(c, terms)])
+        out_min, out_max = self._out_bounds
+        return min(max(out, out_min), out_max)
 
     def nb_coeffs(self):
         """Find number of curve coefficients.
@@ -731,11 +1897,109 @@ class Curve:
         :rtype: int
 
         """
-        ids = []
-        for key in list(self.__dict__.keys()):
-            if "coeff" in key:
-                ids.append(int(key.split("coeff")[-1]))
-        return max(ids)
+        return len(self.coeffs)
+
+    def derivative(self, x, y, var="x"):
+        """Return the partial derivative of a curve polynomial.
+
+        The curve bounds are not considered, i.e. the derivative of the polynomial is returned even outside of the bounds.
+
+        :param float x: First curve independent variable
+        :param float y: Second curve independent variable
+        :param str var: Independent variable used for the derivation: `x` or `y`
+        :return: Partial derivative of the curve
+        :rtype: float
+
+        """
+        factors, exponents = get_derivative_exponents(self.type, var)
+        x = np.asarray(x, dtype=float)[..., np.newaxis]
+        y = np.asarray(y, dtype=float)[..., np.newaxis]
+        return np.dot(
+            x ** exponents[:, 0] * y ** exponents[:, 1], factors * self.coeffs
+        )
+
+    def is_monotonic(
+        self, sign_val, var=None, x_range=None, y_range=None, threshold=5e-3
+    ):
+        """Check, for a single curve, if the partial derivative has the sign we expect.
+
+        The derivative is checked over the curve bounds, or over the intersection of the bounds and the ranges if provided.
+        The output bounds are not considered unless they make the curve constant. Extrema are found analytically: at the corners of the domain, along its edges where the derivative of the
+        derivative is null, and inside the domain where the gradient of the derivative is null.
+
+        :param int sign_val: Expected sign of the derivative: +1 or -1
+        :param str var: Independent variable used for the derivation: `x` or `y`, defaults to `y` for bivariate curves and `x` otherwise
+        :param tuple x_range: Minimum and maximum values of the first independent variable
+        :param tuple y_range: Minimum and maximum values of the second independent variable
+        :param float threshold: Derivatives with an absolute value below the threshold are considered to be null
+        :return: Verification result
+        :rtype: bool
+
+        """
+        if var is None:
+            var = "y" if "bi" in self.type else "x"
+        if np.all(self.coeffs == 0):
+            return False
+
+        # Determine the domain over which the curve is checked
+        ranges = []
+        for bounds, rng in [(self._x_bounds, x_range), (self._y_bounds, y_range)]:
+            rng = bounds if rng is None else rng
+            ranges.append(np.clip(np.asarray(rng, dtype=float), *bounds))
+        (x_min, x_max), (y_min, y_max) = ranges
+
+        # The curve is constant along the variable because of its bounds
+        var_min, var_max = ranges[{"x": 0, "y": 1}[var]]
+        out_min, out_max = self._out_bounds
+        if var_max <= var_min or out_max <= out_min:
+            return True
+
+        factors, exponents = get_derivative_exponents(self.type, var)
+        d_coeffs = factors * self.coeffs
+
+        # Corners of the domain
+        pts = [(x, y) for x in [x_min, x_max] for y in [y_min, y_max]]
+
+        # Extrema along the edges of the domain
+        for col, edge_vals, (lo, hi) in [
+            (1, [x_min, x_max], (y_min, y_max)),
+            (0, [y_min, y_max], (x_min, x_max)),
+        ]:
+            if hi <= lo:
+                continue
+            for edge_val in edge_vals:
+                # Derivative along the edge as a polynomial of the other variable
+                poly = np.zeros(exponents[:, col].max() + 1)
+                for d_coeff, exps in zip(d_coeffs, exponents):
+                    poly[exps[col]] += d_coeff * edge_val ** exps[1 - col]
+                for root in np.polynomial.polynomial.polyroots(
+                    np.polynomial.polynomial.polyder(poly)
+                ):
+                    if np.isreal(root) and lo < root.real < hi:
+                        pts.append(
+                            (edge_val, root.real) if col == 1 else (root.real, edge_val)
+                        )
+
+        # Extremum inside the domain, the derivative is at most a
+        # quadratic polynomial so its gradient is linear
+        if x_max > x_min and y_max > y_min:
+            grad = np.zeros((2, 3))
+            for d_coeff, (ex, ey) in zip(d_coeffs, exponents):
+                for row, (e1, e2) in enumerate([(ex, ey), (ey, ex)]):
+                    if e1 == 1 and e2 == 0:
+                        grad[row, 0] += d_coeff
+                    elif e1 == 2 and e2 == 0:
+                        grad[row, 1 + row] += 2 * d_coeff
+                    elif e1 == 1 and e2 == 1:
+                        grad[row, 2 - row] += d_coeff
+            if np.linalg.det(grad[:, 1:]) != 0:
+                x, y = np.linalg.solve(grad[:, 1:], -grad[:, 0])
+                if x_min < x < x_max and y_min < y < y_max:
+                    pts.append((x, y))
+
+        pts = np.array(pts)
+        derivatives = self.derivative(pts[:, 0], pts[:, 1], var)
+        return bool(np.all(sign_val * derivatives >= -threshold))
 
     def compute_grad(self, x, y, sign_val, threshold=1e-5):
         """Check, for a single curve, if the gradient has the sign we expect. called by check_gradients.
@@ -761,146 +2025,117 @@ class Curve:
         else:
             return False
 
-    def regression(self, data, curve_types):
+    def regression(self, data, curve_types, constrained=True):
         """Find curve coefficient by running a multivariate linear regression.
 
-        :param pandas.DataFrame data: Dataframe object with the following columns: 'X1', 'X1^2', 'X2', 'X2^2', 'X1*X2', 'Y'
+        :param pandas.DataFrame data: Dataframe object with the following columns: 'X1', 'X2', 'Y'
         :param list curve_types: List of Copper curve types
+        :param bool constrained: Fit non-monotonic `cubic` curves again using constraints instead of discarding them
 
         """
-        # Global R^2
-        r_sqr = 0
+        if isinstance(curve_types, str):
+            curve_types = [curve_types]
+
+        # Drop duplicate entries
+        x, y, out = np.unique(data[["X1", "X2", "Y"]].to_numpy(dtype=float), axis=0).T
+
+        # Find model that fits data the best
+        types, coeffs, r_sqr = fit_curves(
+            x, y, out, curve_types, self.get_gradient_sign(), constrained
+        )
+        if types[0] is not None:
+            self.set_fit(types[0], coeffs[0], r_sqr[0])
+
+    def get_gradient_sign(self):
+        """Get the expected sign of the gradient of the curve.
+
+        :return: +1 or -1, None if the curve output variable is not supported
+        :rtype: int
 
-        # Define expected gradient sign
+        """
         if self.out_var == "eir-f-t" or self.out_var == "eir-f-plr":
-            sign_val = +1
+            return +1
         elif self.out_var == "cap-f-t":
-            sign_val = -1
+            return -1
+        return None
 
-        # Drop duplicate entries
-        data.drop_duplicates(inplace=True)
+    def set_fit(self, c_type, coeffs, r_sqr):
+        """Set the type and coefficients of the curve obtained by regression.
 
-        # Find model that fits data the best
-        if "quad" in curve_types:
-            # Prepare data for model
-            data["X1^2"] = data["X1"] * data["X1"]
-            X = data[["X1", "X1^2"]]
-            y = data["Y"]
-
-            # OLS regression
-            X = sm.add_constant(X)
-            model = sm.OLS(y, X).fit()
-            reg_r_sqr = model.rsquared
-
-            if reg_r_sqr > r_sqr:
-                self.coeff1, self.coeff2, self.coeff3 = model.params
-                self.type = "quad"
-                r_sqr = reg_r_sqr
-
-        if "cubic" in curve_types:
-            # Prepare data for model
-            data["X1^2"] = data["X1"] * data["X1"]
-            data["X1^3"] = data["X1"] * data["X1"] * data["X1"]
-            X = data[["X1", "X1^2", "X1^3"]]
-            y = data["Y"]
-
-            # OLS regression
-            X = sm.add_constant(X)
-            model = sm.OLS(y, X).fit()
-            reg_r_sqr = model.rsquared
-
-            # Compute independent variable using model
-            # to see if curve is monotonic
-            vals = []
-            c = Curve(eqp=self.eqp, c_type="cubic")
-            c.coeff1, c.coeff2, c.coeff3, c.coeff4 = model.params
-            for x in data["X1"]:
-                vals.append(c.evaluate(x, 0))
-
-            if reg_r_sqr > r_sqr and self.compute_grad(data["X1"], vals, sign_val):
-                self.coeff1, self.coeff2, self.coeff3, self.coeff4 = model.params
-                self.type = "cubic"
-                r_sqr = reg_r_sqr
-
-        if "bi_quad" in curve_types:
-            # Prepare data for model
-            data["X1^2"] = data["X1"] * data["X1"]
-            data["X2^2"] = data["X2"] * data["X2"]
-            data["X1*X2"] = data["X1"] * data["X2"]
-            X = data[["X1", "X1^2", "X2", "X2^2", "X1*X2"]]
-            y = data["Y"]
-
-            # OLS regression
-            X = sm.add_constant(X)
-            model = sm.OLS(y, X).fit()
-            reg_r_sqr = model.rsquared
-            if reg_r_sqr < 0.8:
-                logging.warning(
-                    "Performance of the regression for {} is poor, r2: {}".format(
-                        self.out_var, round(r_sqr, 2)
-                    )
-                )
-            if reg_r_sqr > r_sqr:
-                (
-                    self.coeff1,
-                    self.coeff2,
-                    self.coeff3,
-                    self.coeff4,
-                    self.coeff5,
-                    self.coeff6,
-                ) = model.params
-                self.type = "bi_quad"
-                r_sqr = reg_r_sqr
-        if "bi_cub" in curve_types:
-            # Prepare data for model
-            data["X1^2"] = data["X1"] * data["X1"]
-            data["X1^3"] = data["X1"] * data["X1"] * data["X1"]
-            data["X2^2"] = data["X2"] * data["X2"]
-            data["X2^3"] = data["X2"] * data["X2"] * data["X2"]
-            data["X1*X2"] = data["X1"] * data["X2"]
-            data["X1^2*X2"] = data["X1^2"] * data["X2"]
-            data["X1*X2^2"] = data["X1"] * data["X2^2"]
-
-            X = data[
-                [
-                    "X1",
-                    "X1^2",
-                    "X2",
-                    "X2^2",
-                    "X1*X2",
-                    "X1^3",
-                    "X2^3",
-                    "X1^2*X2",
-                    "X1*X2^2",
-                ]
-            ]
-            y = data["Y"]
-
-            # OLS regression
-            X = sm.add_constant(X)
-            model = sm.OLS(y, X).fit()
-            reg_r_sqr = model.rsquared
-            if reg_r_sqr < 0.8:
-                logging.warning(
-                    "Performance of the regression for {} is poor, r2: {}".format(
-                        self.out_var, round(r_sqr, 2)
-                    )
+        :param str c_type: Curve type
+        :param numpy.array coeffs: Curve coefficients
+        :param float r_sqr: R^2 of the regression
+
+        """
+        self.type = c_type
+        self.coeffs = coeffs
+        self.covariance = None
+        if "bi" in self.type and r_sqr < 0.8:
+            logging.warning(
+                "Performance of the regression for {} is poor, r2: {}".format(
+                    self.out_var, round(r_sqr, 2)
                 )
-            if reg_r_sqr > r_sqr:
-                (
-                    self.coeff1,
-                    self.coeff2,
-                    self.coeff3,
-                    self.coeff4,
-                    self.coeff5,
-                    self.coeff6,
-                    self.coeff7,
-                    self.coeff8,
-                    self.coeff9,
-                    self.coeff10,
-                ) = model.params
-                self.type = "bi_cub"
-                r_sqr = reg_r_sqr
+            )
+
+    def update_coefficients(
+        self, x, y, out, forgetting_factor=1.0, initial_covariance=1e6
+    ):
+        """Update the curve coefficients with new data points using recursive least squares.
+
+        Each data point is processed in O(k^2), k being the number of coefficients. The covariance of the
+        coefficients is stored with the curve so that updates can be carried out as data becomes available.
+
+        :param numpy.array x: First independent variable values
+        :param numpy.array y: Second independent variable values
+        :param numpy.array out: Output values
+        :param float forgetting_factor: Weight of the previous data points (0-1), 1 gives the same weight to all data points
+        :param float initial_covariance: Initial variance of the coefficients, used for the first update. Large values give little weight to the current coefficients
+        :return: Prediction errors of the curve before each update
+        :rtype: numpy.array
+
+        """
+        if not 0 < forgetting_factor <= 1:
+            raise ValueError("The forgetting factor should be between 0 and 1.")
+        if self.covariance is None:
+            self.covariance = initial_covariance * np.eye(self.nb_coeffs())
+
+        basis = np.atleast_2d(get_basis(self.type, x, y))
+        out = np.broadcast_to(np.asarray(out, dtype=float), basis.shape[:1])
+        coeffs, cov = self.coeffs.astype(float), self.covariance
+        errors = np.zeros(len(out))
+        for idx, (phi, val) in enumerate(zip(basis, out)):
+            cov_phi = cov @ phi
+            gain = cov_phi / (forgetting_factor + phi @ cov_phi)
+            errors[idx] = val - phi @ coeffs
+            coeffs = coeffs + gain * errors[idx]
+            cov = (cov - np.outer(gain, cov_phi)) / forgetting_factor
+
+        self.coeffs = coeffs
+        self.covariance = (cov + cov.T) / 2
+        return errors
+
+    def get_ref_point(self, model=None):
+        """Get the reference values of the independent variables of the curve.
+
+        :param str model: Model of the equipment, the model of the equipment of the curve is used if not specified
+        :return: Reference values of the first and second independent variables
+        :rtype: tuple
+
+        """
+        if model is None:
+            model = self.eqp.model
+        # TODO: move values to Chiller() class
+        if model == "lct_lwt":
+            if self.out_var in ["eir-f-t", "cap-f-t"]:
+                return self.ref_lwt, self.ref_lct
+            if self.out_var == "eir-f-plr":
+                return self.ref_lct, 1.0  # plr = 1.0
+        elif model == "ect_lwt":
+            if self.out_var in ["eir-f-t", "cap-f-t"]:
+                return self.ref_lwt, self.ref_ect
+            if self.out_var == "eir-f-plr":
+                return 1.0, 0.0  # plr = 1.0, no dependent variable
+        return self.ref_x, self.ref_y
 
     def get_out_reference(self, eqp):
         """Return the reference output of a curve.
@@ -913,42 +2148,146 @@ class Curve:
         x_ref, y_ref = eqp.get_ref_values(self.out_var)
         return self.evaluate(x_ref, y_ref)
 
-    def normalized(self, data, x_norm, y_norm):
+    def normalized(self, data=None, x_norm=None, y_norm=None):
         """Normalize curve around the reference data points.
 
-        :param pandas.DataFrame data: Dataframe object with the following columns: 'X1', 'X1^2', 'X2', 'X2^2', 'X1*X2', 'Y'
+        The coefficients are divided by the output of the curve at the reference data points, so are the output bounds unless
+        they are not set.
+
+        Both `normalized(x_norm, y_norm)` and the former `normalized(data, x_norm, y_norm)` calls are supported.
+
+        :param pandas.DataFrame data: Ignored, the curve is normalized using its coefficients. Kept for backward compatibility
         :param float x_norm: First independent variable normalization points
         :param float y_norm: Second independent variable normalization points
 
         """
+        # Calls without data
+        if y_norm is None:
+            x_norm, y_norm = data, x_norm
+
         # Normalization point
         norm_out = self.evaluate(x_norm, y_norm)
-        data["Y"] = data.apply(
-            lambda row: self.evaluate(row["X1"], row["X2"]) / norm_out, axis=1
-        )
+        if norm_out == 0:
+            raise ValueError(
+                "The output of the curve is null at the normalization point, the curve cannot be normalized."
+            )
 
-        self.regression(data, [self.type])
+        self.coeffs = self.coeffs / norm_out
+        if getattr(self, "covariance", None) is not None:
+            self.covariance = self.covariance / norm_out**2
+
+        # Output bounds, nulls and -999/999 are left as is
+        out_bounds = []
+        for val in [self.out_min, self.out_max]:
+            if val is None or abs(val) == 999:
+                out_bounds.append(val)
+            else:
+                out_bounds.append(val / norm_out)
+        if norm_out < 0:
+            out_bounds = [
+                -val if val is not None and abs(val) == 999 else val
+                for val in out_bounds[::-1]
+            ]
+        self.out_min, self.out_max = out_bounds
+
+    def convert_coefficients(self, units):
+        """Convert curve coefficients and bounds to a new unit system.
+
+        The conversion of the independent variables is an affine substitution so the coefficients are converted exactly.
+        The outputs of the curves are dimensionless and are not converted.
+
+        :param str units: Unit system to convert to: `si` or `ip`
+
+        """
+        if self.units == units:
+            return
+        var_types = get_independent_variables(
+            self.out_var, self.type, getattr(self.eqp, "model", None)
+        )
+        m = get_conversion_matrix(self.type, var_types, units)
+        self.coeffs = m @ self.coeffs
+        if getattr(self, "covariance", None) is not None:
+            self.covariance = m @ self.covariance @ m.T
+        for var, var_type in zip(["x", "y"], var_types):
+            for side in ["min", "max"]:
+                att = "{}_{}".format(var, side)
+                setattr(
+                    self, att, convert_variable(getattr(self, att), var_type, units)
+                )
+        self.units = units
 
     def convert_coefficients_to_ip(self):
         """Convert curve coefficient to imperial units"""
-        if self.units == "si":
-            data_pts = []
-            if "f-t" in self.out_var and "bi" in self.type:
-                for x in np.linspace(self.x_min, self.x_max, 5):
-                    for y in np.linspace(self.y_min, self.y_max, 5):
-                        x_ip = Units(x, "degC")
-                        y_ip = Units(y, "degC")
-                        data_pt = [
-                            x_ip.conversion("degF"),
-                            y_ip.conversion("degF"),
-                            self.evaluate(x, y),
-                        ]
-                        data_pts.append(data_pt)
-            if len(data_pts) > 0:
-                data = pd.DataFrame(data_pts, columns=["X1", "X2", "Y"])
-                self.regression(data, self.type)
-                self.x_min = Units(self.x_min, "degC").conversion("degF")
-                self.x_max = Units(self.x_max, "degC").conversion("degF")
-                self.y_min = Units(self.y_min, "degC").conversion("degF")
-                self.y_max = Units(self.y_max, "degC").conversion("degF")
-                self.units = "ip"
+        self.convert_coefficients("ip")
+
+    def convert_coefficients_to_si(self):
+        """Convert curve coefficient to SI units"""
+        self.convert_coefficients("si")
+
+
+# Coefficients are stored in Curve.coeffs, coeff1 to coeff10
+# are provided as a view of the individual coefficients
+for idx in range(1, 11):
+    setattr(Curve, "coeff{}".format(idx), coeff_property(idx))
+
+for var in ["x", "y", "out"]:
+    for side in ["min", "max"]:
+        setattr(Curve, "{}_{}".format(var, side), bound_property(var, side))
+
+
+class CurveBatch:
+    def __init__(self, curves):
+        if len(set([c.type for c in curves])) != 1:
+            raise ValueError("Curves in a batch must all be of the same type.")
+        self.type = curves[0].type
+        self.out_var = curves[0].out_var
+        self.coeffs = np.array([c.coeffs for c in curves], dtype=float)
+
+        # Bounds of each curve, nulls are replaced by -999 and 999
+        bounds = np.array(
+            [c._x_bounds + c._y_bounds + c._out_bounds for c in curves],
+            dtype=float,
+        )
+        (
+            self.x_min,
+            self.x_max,
+            self.y_min,
+            self.y_max,
+            self.out_min,
+            self.out_max,
+        ) = bounds.T
+
+        # Curves sharing the same input bounds can share their polynomial terms
+        self.shared_bounds = bool(np.all(bounds[:, :4] == bounds[0, :4]))
+
+    def __len__(self):
+        return len(self.coeffs)
+
+    def evaluate(self, x, y):
+        """Return the output of all the curves of the batch.
+
+        :param numpy.array x: First curve independent variable values
+        :param numpy.array y: Second curve independent variable values
+        :return: Curves outputs, one row per curve and one column per point
+        :rtype: numpy.array
+
+        """
+        x, y = np.broadcast_arrays(
+            np.atleast_1d(np.asarray(x, dtype=float)),
+            np.atleast_1d(np.asarray(y, dtype=float)),
+        )
+        if self.shared_bounds:
+            basis = get_basis(
+                self.type,
+                np.clip(x, self.x_min[0], self.x_max[0]),
+                np.clip(y, self.y_min[0], self.y_max[0]),
+            )
+            out = np.matmul(self.coeffs, basis.T)
+        else:
+            basis = get_basis(
+                self.type,
+                np.clip(x, self.x_min[:, np.newaxis], self.x_max[:, np.newaxis]),
+                np.clip(y, self.y_min[:, np.newaxis], self.y_max[:, np.newaxis]),
+            )
+            out = np.einsum("nmk,nk->nm", basis, self.coeffs)
+        return np.clip(out, self.out_min[:, np.newaxis], self.out_max[:, np.newaxis])
@@ -10,9 +10,7 @@ import warnings
 warnings.simplefilter(action="ignore", category=FutureWarning)
 import numpy as np
 import pandas as pd
-import statsmodels.api as sm
 import matplotlib.pyplot as plt
-import copy
 import random
 import logging
 
@@ -43,6 +41,9 @@ class Generator:
         random_seed=None,
         num_nearest_neighbors=10,
         max_restart=None,
+        nn_vars=["ref_cap", "full_eff"],
+        nn_metric="l1",
+        nn_weights=None,
     ):
         self.equipment = equipment
         self.method = method
@@ -59,6 +60,9 @@ class Generator:
         self.base_curves = base_curves
 
         self.num_nearest_neighbors = num_nearest_neighbors
+        self.nn_vars = nn_vars
+        self.nn_metric = nn_metric
+        self.nn_weights = nn_weights
 
         if isinstance(random_seed, int):
             random.seed(random_seed)
@@ -83,24 +87,37 @@ class Generator:
             else:
                 seed_curves = self.equipment.get_seed_curves()  # get seed curves
                 ranges, misc_attr = self.equipment.ranges, self.equipment.misc_attr
+                nn_args = {
+                    "vars": self.nn_vars,
+                    "metric": self.nn_metric,
+                    "weights": self.nn_weights,
+                }
                 if self.method == "nearest_neighbor":
                     self.base_curve = seed_curves.get_aggregated_set_of_curves(
                         ranges=ranges,
                         misc_attr=misc_attr,
                         method="NN-weighted-average",
                         N=self.num_nearest_neighbors,
+                        nn_vars=self.nn_vars,
+                        nn_metric=self.nn_metric,
+                        nn_weights=self.nn_weights,
                     )
                     self.base_curves = [self.base_curve]
                     self.df, _ = seed_curves.nearest_neighbor_sort(
-                        target_attr=misc_attr, N=self.num_nearest_neighbors
+                        target_attr=misc_attr, N=self.num_nearest_neighbors, **nn_args
                     )
                 elif self.method == "weighted_average":
                     self.base_curve = seed_curves.get_aggregated_set_of_curves(
-                        ranges=ranges, misc_attr=misc_attr, method="weighted-average"
+                        ranges=ranges,
+                        misc_attr=misc_attr,
+                        method="weighted-average",
+                        nn_vars=self.nn_vars,
+                        nn_metric=self.nn_metric,
+                        nn_weights=self.nn_weights,
                     )
                     self.base_curves = [self.base_curve]
                     self.df, _ = seed_curves.nearest_neighbor_sort(
-                        target_attr=misc_attr
+                        target_attr=misc_attr, **nn_args
                     )
                 else:
                     self.base_curves = None
@@ -275,7 +292,10 @@ class Generator:
             and (full_rating_alt >= self.full_eff_alt * (1 - self.tol))
             and (cap_rating <= self.tol)
             and (cap_rating >= -self.tol)
-            # and self.check_gradients()
+            # The gradients are not part of the target, see check_gradients(): the
+            # mutations do not steer the curves towards monotonicity, so requiring
+            # it keeps restarting the generator (e.g. test_tutorial_si and
+            # test_single_target_lct never converge)
         ):
             return True
         else:
@@ -304,8 +324,23 @@ class Generator:
                     else:
                         raise ValueError("this curve output has not been implemented")
 
-                    x, y = self.set_of_base_curves.get_data_for_plotting(c, False)
-                    grad_list.append(self.compute_grad(x=x, y=y, sign_val=sign_val))
+                    # Check the curve over the range of values used for plotting
+                    rng = self.equipment.plotting_range[c.out_var]
+                    if "x2_min" in rng.keys():
+                        grad_list.append(
+                            c.is_monotonic(
+                                sign_val,
+                                "y",
+                                x_range=(rng["x1_min"], rng["x1_max"]),
+                                y_range=(rng["x2_min"], rng["x2_max"]),
+                            )
+                        )
+                    else:
+                        grad_list.append(
+                            c.is_monotonic(
+                                sign_val, "x", x_range=(rng["x1_min"], rng["x1_max"])
+                            )
+                        )
 
                 if np.all(np.asarray(grad_list)):
                     return True
@@ -376,19 +411,13 @@ class Generator:
         :rtype: SetofCurves
 
         """
-        new_curves = copy.deepcopy(curves[0])
+        new_curves = curves[0].copy()
         for curve in new_curves.curves:
             if len(self.vars) == 0 or curve.out_var in self.vars:
-                for idx in range(1, 11):
-                    try:
-                        # TODO: screening criteria
-                        setattr(
-                            curve,
-                            "coeff{}".format(idx),
-                            getattr(curve, "coeff{}".format(idx)) + self.get_random(),
-                        )
-                    except:
-                        pass
+                # TODO: screening criteria
+                curve.coeffs = curve.coeffs + np.array(
+                    [self.get_random() for _ in range(curve.nb_coeffs())]
+                )
         return new_curves
 
     def calc_fit(self, pop):
@@ -417,9 +446,9 @@ class Generator:
 
         # Determine and normalized "normalization" fitness
         if len(self.vars) > 1:
-            normalization_fitnesses = [
-                self.determine_normalization_fitness(curves) for curves in pop
-            ]
+            normalization_fitnesses = self.determine_population_normalization_fitness(
+                pop
+            )
             if max(normalization_fitnesses) > 0:
                 normalization_fitnesses = [
                     score / max(normalization_fitnesses)
@@ -551,6 +580,37 @@ class Generator:
                 curve_normal_score += abs(1 - c.get_out_reference(self.equipment))
         return curve_normal_score
 
+    def determine_population_normalization_fitness(self, pop):
+        """Determine the normalization fitness of all the sets of curves of a population at once.
+
+        :param list pop: Population of individual, i.e. list of curves
+        :return: Fitness score of each individual
+        :rtype: list
+
+        """
+        curve_normal_scores = np.zeros(len(pop))
+        for var in self.vars:
+            idxs, curves = [], []
+            for idx, set_of_curves in enumerate(pop):
+                for c in set_of_curves.curves:
+                    if c.out_var == var:
+                        idxs.append(idx)
+                        curves.append(c)
+            if len(curves) == 0:
+                continue
+            x_ref, y_ref = self.equipment.get_ref_values(var)
+            np.add.at(
+                curve_normal_scores,
+                idxs,
+                np.abs(
+                    1
+                    - evaluate_curves(curves, np.array([x_ref]), np.array([y_ref]))[
+                        :, 0
+                    ]
+                ),
+            )
+        return list(curve_normal_scores)
+
     def scale_fitnesses(self, fitnesses, pop, scaling=True):
         """Scale the fitness scores to prevent best performers from dragging the whole population to a local extremum.
 
@@ -614,7 +674,7 @@ class Generator:
         :rtype: SetofCurves
 
         """
-        new_individual = copy.deepcopy(individual)
+        new_individual = individual.copy()
         for curve in new_individual.curves:
             if len(self.vars) == 0 or curve.out_var in self.vars:
                 idx = random.randint(1, curve.nb_coeffs())
@@ -647,7 +707,7 @@ class Generator:
                 # male and female curves are structured the same way
                 for _, c in enumerate(male.curves):
                     # Copy as male
-                    n_child_curves = copy.deepcopy(c)
+                    n_child_curves = c.copy()
                     if c.out_var in self.vars or len(self.vars) == 0:
                         if c.type == "quad":
                             positions = [[1], [2, 3]]  # cst  # x^?
@@ -671,7 +731,7 @@ class Generator:
                             ]  # x*y^2
                         else:
                             raise ValueError("Type of curve not yet implemented.")
-                        couple = ["male", copy.deepcopy(female)]
+                        couple = ["male", female.copy()]
                         cnt = 0
                         for p in positions:
                             # Alternate between male and female
@@ -0,0 +1,234 @@
+"""
+kernels.py
+====================================
+Numerical kernels used in the hot loops of Copper: curve evaluation, condenser temperature residual, and IPLV calculation.
+The kernels operate on single points and on tuples of Python numbers. They are compiled with numba when it is installed, plain Python is used otherwise.
+The backend is selected automatically but can be forced using the `COPPER_BACKEND` environment variable or `set_backend()`.
+"""
+
+import os
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+BACKENDS = ["python", "numba"]
+
+# Coefficients from AHRI Std 551/591
+IPLV_WEIGHTS = (0.01, 0.42, 0.45, 0.12)
+
+
+def _evaluate_curve(coeffs, exponents, bounds, x, y):
+    """Return the output of a curve.
+
+    :param tuple coeffs: Curve coefficients
+    :param tuple exponents: Exponents of the independent variables for each coefficient
+    :param tuple bounds: Curve bounds: x_min, x_max, y_min, y_max, out_min, out_max
+    :param float x: First curve independent variable
+    :param float y: Second curve independent variable
+    :return: Curve output
+    :rtype: float
+
+    """
+    x = min(max(x, bounds[0]), bounds[1])
+    y = min(max(y, bounds[2]), bounds[3])
+    out = 0.0
+    for i in range(len(coeffs)):
+        out += coeffs[i] * x ** exponents[i][0] * y ** exponents[i][1]
+    return min(max(out, bounds[4]), bounds[5])
+
+
+def _make_cond_inlet_temp_residual(evaluate_curve):
+    """Create the condenser temperature residual kernel using a specific curve evaluation kernel.
+
+    :param function evaluate_curve: Curve evaluation kernel
+    :return: Condenser temperature residual kernel
+    :rtype: function
+
+    """
+
+    def cond_inlet_temp_residual(
+        lct,
+        lwt,
+        load,
+        cap_f_lwt_lct_rated,
+        ref_cap,
+        ref_cop,
+        ect,
+        m_c,
+        c_p,
+        cap_f_t_coeffs,
+        cap_f_t_exponents,
+        cap_f_t_bounds,
+        eir_f_t_coeffs,
+        eir_f_t_exponents,
+        eir_f_t_bounds,
+        eir_f_plr_coeffs,
+        eir_f_plr_exponents,
+        eir_f_plr_bounds,
+    ):
+        # Temperature dependent curve modifiers
+        cap_f_lwt_lct = evaluate_curve(
+            cap_f_t_coeffs, cap_f_t_exponents, cap_f_t_bounds, lwt, lct
+        )
+        eir_f_lwt_lct = evaluate_curve(
+            eir_f_t_coeffs, eir_f_t_exponents, eir_f_t_bounds, lwt, lct
+        )
+
+        # Operating variables
+        cap_op = ref_cap * cap_f_lwt_lct
+        if cap_f_lwt_lct_rated == -999:
+            plr = load
+        else:
+            plr = load * cap_f_lwt_lct_rated / cap_f_lwt_lct
+
+        # PLR and temperature curve modifier
+        eir_f_plr_lct = evaluate_curve(
+            eir_f_plr_coeffs, eir_f_plr_exponents, eir_f_plr_bounds, lct, plr
+        )
+
+        # Chiller power, and condenser heat transfer
+        p = (cap_op / ref_cop) * eir_f_lwt_lct * eir_f_plr_lct
+        q_c = p + cap_op * plr
+
+        # Recalculate ECT
+        return (ect - (lct - q_c / (m_c * c_p))) / ect
+
+    return cond_inlet_temp_residual
+
+
+def _iplv(kwpton, weights):
+    """Calculate the IPLV from the efficiency at each rated load.
+
+    :param tuple kwpton: Efficiency at each rated load in kW/ton
+    :param tuple weights: Weighting of each rated load
+    :return: IPLV in kW/ton
+    :rtype: float
+
+    """
+    out = 0.0
+    for i in range(len(kwpton)):
+        out += weights[i] / kwpton[i]
+    return 1 / out
+
+
+KERNELS = {
+    "python": {
+        "evaluate_curve": _evaluate_curve,
+        "cond_inlet_temp_residual": _make_cond_inlet_temp_residual(_evaluate_curve),
+        "iplv": _iplv,
+    }
+}
+if numba is not None:
+    _evaluate_curve_numba = numba.njit(cache=True)(_evaluate_curve)
+    KERNELS["numba"] = {
+        "evaluate_curve": _evaluate_curve_numba,
+        "cond_inlet_temp_residual": numba.njit(
+            _make_cond_inlet_temp_residual(_evaluate_curve_numba)
+        ),
+        "iplv": numba.njit(cache=True)(_iplv),
+    }
+
+_backend = None
+
+
+def get_backend():
+    """Get the backend used by the kernels.
+
+    :return: Name of the backend
+    :rtype: str
+
+    """
+    return _backend
+
+
+def set_backend(backend=None):
+    """Set the backend used by the kernels.
+
+    :param str backend: Name of the backend, either `python` or `numba`. If not specified, numba is used when it is installed
+    :return: Name of the backend
+    :rtype: str
+
+    """
+    global _backend
+    if backend is None or backend == "auto":
+        backend = "numba" if "numba" in KERNELS.keys() else "python"
+    if not backend in BACKENDS:
+        raise ValueError(
+            f"Backend {backend} not supported, supported backends are: {', '.join(BACKENDS)}."
+        )
+    if not backend in KERNELS.keys():
+        raise ValueError(f"Backend {backend} cannot be used, numba is not installed.")
+    _backend = backend
+    return _backend
+
+
+def evaluate_curve(coeffs, exponents, bounds, x, y):
+    """Return the output of a curve.
+
+    :param tuple coeffs: Curve coefficients
+    :param tuple exponents: Exponents of the independent variables for each coefficient
+    :param tuple bounds: Curve bounds: x_min, x_max, y_min, y_max, out_min, out_max
+    :param float x: First curve independent variable
+    :param float y: Second curve independent variable
+    :return: Curve output
+    :rtype: float
+
+    """
+    return KERNELS[_backend]["evaluate_curve"](
+        coeffs, exponents, bounds, float(x), float(y)
+    )
+
+
+def cond_inlet_temp_residual(
+    lct, lwt, load, cap_f_lwt_lct_rated, ref_cap, ref_cop, ect, m_c, c_p, curves
+):
+    """Calculate the entering condenser temperature residual based on a leaving condenser temperature.
+
+    :param float lct: Leaving condenser temperature (deg. C)
+    :param float lwt: Leaving chilled water temperature (deg. C)
+    :param float load: Percentage load
+    :param float cap_f_lwt_lct_rated: Capacity curve modifier at full load rated conditions, -999 at full load
+    :param float ref_cap: Reference capacity (kW)
+    :param float ref_cop: Reference COP
+    :param float ect: Entering condenser temperature (deg. C)
+    :param float m_c: Condenser mass flow rate (kg/s)
+    :param float c_p: Specific heat capacity of the condenser fluid (kJ/kg.K)
+    :param list curves: Kernel arguments of the cap-f-t, eir-f-t, and eir-f-plr curves, see `Curve.get_kernel_args()`
+    :return: Entering condenser temperature residual
+    :rtype: float
+
+    """
+    cap_f_t, eir_f_t, eir_f_plr = curves
+    return KERNELS[_backend]["cond_inlet_temp_residual"](
+        float(lct),
+        float(lwt),
+        float(load),
+        float(cap_f_lwt_lct_rated),
+        float(ref_cap),
+        float(ref_cop),
+        float(ect),
+        float(m_c),
+        float(c_p),
+        *cap_f_t,
+        *eir_f_t,
+        *eir_f_plr,
+    )
+
+
+def iplv(kwpton, weights=IPLV_WEIGHTS):
+    """Calculate the IPLV from the efficiency at each rated load.
+
+    :param list kwpton: Efficiency at each rated load in kW/ton
+    :param tuple weights: Weighting of each rated load, defaults to AHRI Std 551/591
+    :return: IPLV in kW/ton
+    :rtype: float
+
+    """
+    return KERNELS[_backend]["iplv"](
+        tuple([float(val) for val in kwpton]), tuple(weights)
+    )
+
+
+set_backend(os.environ.get("COPPER_BACKEND"))
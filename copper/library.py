@@ -4,7 +4,7 @@ library.py
 This is the library module of Copper. It contains functions used to parse the JSON library files.
 """
 
-import json, inspect
+import json, inspect, pickle
 from copper.units import *
 from copper.curves import *
 import copper.chiller
@@ -13,12 +13,63 @@ from typing import List, Dict
 location = os.path.dirname(os.path.realpath(__file__))
 chiller_lib = os.path.join(location, "lib", "chiller_curves.json")
 
+# Fields used to group the library entries when computing attribute statistics
+GROUP_FIELDS = [
+    "compressor_type",
+    "condenser_type",
+    "compressor_speed",
+    "model",
+    "sim_engine",
+]
+
+# Libraries loaded by load_library(): parsed data, serialized so that it cannot be
+# modified, and caches shared by the Library objects of a same library file
+libraries = {}
+
+
+def load_library(path=chiller_lib, rating_std=""):
+    """Load a library, each library file is only parsed once.
+
+    Each call returns a new Library object with its own copy of the data so that modifications of a library (e.g. unit conversion) do not affect other users of the same library file.
+    The attribute index and the cached curve outputs are shared by these objects until their curves are modified, see `Library.convert_coefficients()`.
+
+    :param str path: Full path of json library
+    :param str rating_std: Rating standard used to calculate the part load efficiency of the library entries
+    :return: Library object
+    :rtype: Library
+
+    """
+    key = (os.path.realpath(path), os.path.getmtime(path), rating_std)
+    if not key in libraries.keys():
+        lib = Library(path=path, rating_std=rating_std)
+        libraries[key] = {"data": pickle.dumps(lib.data), "caches": lib.caches}
+        return lib
+    return Library(
+        path=path,
+        rating_std=rating_std,
+        data=pickle.loads(libraries[key]["data"]),
+        caches=libraries[key]["caches"],
+    )
+
 
 class Library:
-    def __init__(self, path=chiller_lib, rating_std="", export=False):
+    def __init__(
+        self, path=chiller_lib, rating_std="", export=False, data=None, caches=None
+    ):
         self.path = path
         self.rating_std = rating_std
 
+        # Columnar index of the entries attributes, see get_attribute_index(),
+        # and cached curve outputs, see get_grid_values()
+        if caches is None:
+            caches = {"attribute_index": None, "grid_values": {}}
+        self.caches = caches
+
+        # Library data already loaded and processed, see load_library()
+        if not data is None:
+            self.data = data
+            return
+
         # Load library
         self.data = json.loads(open(self.path, "r").read())
 
@@ -85,6 +136,22 @@ class Library:
                     if "part_eff_unit" in vals.keys():
                         del vals["part_eff_unit"]
 
+    @property
+    def attribute_index(self):
+        return self.caches["attribute_index"]
+
+    @attribute_index.setter
+    def attribute_index(self, val):
+        self.caches["attribute_index"] = val
+
+    @property
+    def grid_values(self):
+        return self.caches["grid_values"]
+
+    @grid_values.setter
+    def grid_values(self, val):
+        self.caches["grid_values"] = val
+
     def load_obj(self, data):
         """Load data for an equipment from the libary.
         :param dict data: Equipment data in a dict format
@@ -123,9 +190,10 @@ class Library:
         return self.data
 
     def _remove_set_of_curves(self, curve_data: List[Dict]) -> pd.DataFrame:
-        curve_data_without_set_of_curves = curve_data.copy()
-        for curve_data in curve_data_without_set_of_curves:
-            del curve_data["set_of_curves"]
+        curve_data_without_set_of_curves = [
+            {k: v for k, v in props.items() if k != "set_of_curves"}
+            for props in curve_data
+        ]
         return pd.DataFrame(curve_data_without_set_of_curves)
 
     def _merge_curve_data(self, curve_data: pd.DataFrame) -> Dict[str, List]:
@@ -157,62 +225,69 @@ class Library:
         # Find name of equiment that match specified filter
         eqp_match = self.find_equipment(filters)
 
-        # List of sets of curves that match specified filters
-        set_of_curvess = []
-
         # Retrieve identified equipment's sets of curves from the library
-        for name, props in eqp_match.items():
-            c_set = SetofCurves()
-
-            # Get equipment properties
-            eqp_props = inspect.getfullargspec(
-                eval("copper." + props["eqp_type"].capitalize()).__init__
-            )[0]
-            eqp_props.remove("self")
-
-            # Set the equipment properties
-            # using values from the library
-            obj_args = {}
-            for p in eqp_props:
-                if not "set_of_curves" in p:
-                    if part_eff_flag and "part_eff" in p:
-                        if p == "part_eff_ref_std":
-                            obj_args["part_eff_ref_std"] = "ahri_550/590"
-                        else:
-                            if p in props.keys():
-                                obj_args[p] = props[p]
-                    elif "part_eff" in p or "alt" in p:
-                        pass
+        return [self.load_set_of_curves(name, part_eff_flag) for name in eqp_match]
+
+    def load_set_of_curves(self, name, part_eff_flag=False):
+        """Create a set of curves object, and its equipment, from a library entry.
+
+        :param str name: Name of the library entry
+        :param bool part_eff_flag: Set the part load efficiency of the equipment using the library entry
+        :return: Set of curves object
+        :rtype: SetofCurves
+
+        """
+        props = self.data[name]
+        c_set = SetofCurves()
+
+        # Get equipment properties
+        eqp_props = inspect.getfullargspec(
+            eval("copper." + props["eqp_type"].capitalize()).__init__
+        )[0]
+        eqp_props.remove("self")
+
+        # Set the equipment properties
+        # using values from the library
+        obj_args = {}
+        for p in eqp_props:
+            if not "set_of_curves" in p:
+                if part_eff_flag and "part_eff" in p:
+                    if p == "part_eff_ref_std":
+                        obj_args["part_eff_ref_std"] = "ahri_550/590"
                     else:
-                        obj_args[p] = props[p]
+                        if p in props.keys():
+                            obj_args[p] = props[p]
+                elif "part_eff" in p or "alt" in p:
+                    pass
+                else:
+                    obj_args[p] = props[p]
 
-            # Create instance of the equipment
-            obj = eval("copper." + props["eqp_type"].capitalize())(**obj_args)
-            c_set.eqp = obj
+        # Create instance of the equipment
+        obj = eval("copper." + props["eqp_type"].capitalize())(**obj_args)
+        c_set.eqp = obj
+        c_set.name = name
 
-            # Retrive all attributes of the sets of curves object
-            for c_att in list(c_set.__dict__):
-                # Set the attribute of new Curve object
-                # if attrubute are identified in database entry
-                if c_att in list(self.data[name].keys()):
-                    c_set.__dict__[c_att] = self.data[name][c_att]
+        # Retrive all attributes of the sets of curves object
+        for c_att in SetofCurves.__slots__:
+            # Set the attribute of new Curve object
+            # if attrubute are identified in database entry
+            if c_att in list(self.data[name].keys()):
+                setattr(c_set, c_att, self.data[name][c_att])
 
-            c_lst = []
+        c_lst = []
 
-            # Create new SetofCurves and Curve objects for all the
-            # sets of curves identified as matching the filters
-            for c in self.data[name]["set_of_curves"]:
-                c_lst.append(
-                    self.get_curve(
-                        c,
-                        self.data[name],
-                        eqp=self.load_obj(self.data[name]),
-                    )
+        # Create new SetofCurves and Curve objects for all the
+        # sets of curves identified as matching the filters
+        for c in self.data[name]["set_of_curves"]:
+            c_lst.append(
+                self.get_curve(
+                    c,
+                    self.data[name],
+                    eqp=self.load_obj(self.data[name]),
                 )
-            c_set.curves = c_lst
-            set_of_curvess.append(c_set)
-
-        return set_of_curvess
+            )
+        c_set.curves = c_lst
+        return c_set
 
     def find_equipment(self, filters=[]):
         """Find equipment matching specified filter in the curve library.
@@ -228,31 +303,155 @@ class Library:
         :rtype: dict
 
         """
-        eqp_match_dict = {}
-        for eqp in self.data:
-            assertions = []
-            for prop, val in filters:
-                # ~! = all but...
-                if "~!" in val:
-                    assertions.append(
-                        val.replace("~!", "").lower().strip()
-                        not in self.data[eqp][prop].lower().strip()
-                    )
-                # ! = does not include
-                elif "!" in val:
-                    assertions.append(self.data[eqp][prop] != val)
-                # ~ = includes
-                elif "~" in val:
-                    assertions.append(
-                        val.replace("~", "").lower().strip()
-                        in self.data[eqp][prop].lower().strip()
-                    )
-                else:
-                    assertions.append(self.data[eqp][prop] == val)
-            if all(assertions):
-                eqp_match_dict[eqp] = self.data[eqp]
+        index = self.get_attribute_index()
+        match = np.ones(len(index["names"]), dtype=bool)
+        for prop, val in filters:
+            field = index["fields"][prop]
+            # Filters are evaluated once for each unique value of the field
+            cat_match = np.array(
+                [self.match_filter(cat, val) for cat in field["categories"]],
+                dtype=bool,
+            )
+            match &= cat_match[field["codes"]]
 
-        return eqp_match_dict
+        return {name: self.data[name] for name in index["names"][match]}
+
+    def match_filter(self, value, val):
+        """Check if the value of a field matches a filter.
+
+        :param value: Value of the field
+        :param str val: Filter value, see `find_equipment()` for special filter characters
+        :return: Result of the check
+        :rtype: bool
+
+        """
+        if isinstance(val, str):
+            value_str = "" if value is None else str(value).lower().strip()
+            # ~! = all but...
+            if "~!" in val:
+                return val.replace("~!", "").lower().strip() not in value_str
+            # ! = does not include
+            elif "!" in val:
+                return value != val
+            # ~ = includes
+            elif "~" in val:
+                return val.replace("~", "").lower().strip() in value_str
+        return value == val
+
+    def get_attribute_index(self):
+        """Get a columnar index of the attributes of the library entries.
+
+        Each field is stored as category codes. Numeric fields are also stored as arrays of values, NaN being used for missing values.
+        Entries are grouped by the values of their `GROUP_FIELDS`.
+
+        :return: Dictionary containing the name of the entries, the index of each field, and the group of each entry
+        :rtype: dict
+
+        """
+        if self.attribute_index is None:
+            names = list(self.data.keys())
+            fields = {}
+            for field in dict.fromkeys(
+                [f for props in self.data.values() for f in props.keys()]
+            ):
+                if field == "set_of_curves":
+                    continue
+                values = [props.get(field) for props in self.data.values()]
+                categories = list(dict.fromkeys(values))
+                codes = {cat: idx for idx, cat in enumerate(categories)}
+                fields[field] = {
+                    "categories": categories,
+                    "codes": np.array([codes[v] for v in values], dtype=int),
+                }
+                if all(
+                    [
+                        v is None or (isinstance(v, (int, float)) and v is not True)
+                        for v in values
+                    ]
+                ) and not all([v is None for v in values]):
+                    fields[field]["values"] = np.array(values, dtype=float)
+
+            # Group of each entry
+            group_fields = [f for f in GROUP_FIELDS if f in fields.keys()]
+            groups = np.ravel_multi_index(
+                [fields[f]["codes"] for f in group_fields],
+                [len(fields[f]["categories"]) for f in group_fields],
+            )
+            self.attribute_index = {
+                "names": np.array(names, dtype=object),
+                "rows": {name: idx for idx, name in enumerate(names)},
+                "fields": fields,
+                "groups": np.unique(groups, return_inverse=True)[1],
+                "stats": {},
+            }
+        return self.attribute_index
+
+    def get_attribute_values(self, names, vars):
+        """Get the values of numeric attributes of library entries.
+
+        :param list names: Name of the library entries
+        :param list vars: Name of the attributes
+        :return: Values of the attributes, one row per entry, NaN if missing
+        :rtype: numpy.array
+
+        """
+        index = self.get_attribute_index()
+        rows = [index["rows"][name] for name in names]
+        values = np.full((len(rows), len(vars)), np.nan)
+        for var_idx, var in enumerate(vars):
+            if "values" in index["fields"].get(var, {}).keys():
+                values[:, var_idx] = index["fields"][var]["values"][rows]
+        return values
+
+    def get_attribute_stats(self, names, vars):
+        """Get the mean and standard deviation of numeric attributes over library entries that have all of them.
+
+        The count, sum and sum of squares of the attributes of each group of entries are calculated once for each list of
+        attributes. The statistics of entries that form complete groups are obtained by combining them.
+
+        :param list names: Name of the library entries
+        :param list vars: Name of the attributes
+        :return: Mean and standard deviation (with one degree of freedom) of each attribute
+        :rtype: tuple
+
+        """
+        index = self.get_attribute_index()
+        key = tuple(vars)
+        all_values = self.get_attribute_values(index["names"], vars)
+        all_valid = ~np.isnan(all_values).any(axis=1)
+        if not key in index["stats"].keys():
+            groups = index["groups"][all_valid]
+            nb_groups = index["groups"].max() + 1
+            index["stats"][key] = (
+                np.bincount(groups, minlength=nb_groups),
+                np.array(
+                    [
+                        np.bincount(groups, weights=vals, minlength=nb_groups)
+                        for vals in all_values[all_valid].T
+                    ]
+                ),
+                np.array(
+                    [
+                        np.bincount(groups, weights=vals**2, minlength=nb_groups)
+                        for vals in all_values[all_valid].T
+                    ]
+                ),
+            )
+        count, total, total_sqr = index["stats"][key]
+
+        rows = np.array([index["rows"][name] for name in names], dtype=int)
+        rows = np.unique(rows[all_valid[rows]])
+        groups = np.unique(index["groups"][rows])
+        if len(rows) < 2:
+            return np.full(len(vars), np.nan), np.full(len(vars), np.nan)
+        if count[groups].sum() == len(rows):
+            # Entries form complete groups
+            n = len(rows)
+            mean = total[:, groups].sum(axis=1) / n
+            var = (total_sqr[:, groups].sum(axis=1) - n * mean**2) / (n - 1)
+            return mean, np.sqrt(np.maximum(var, 0))
+        values = all_values[rows]
+        return values.mean(axis=0), values.std(axis=0, ddof=1)
 
     def get_set_of_curves_by_name(self, curve_name):
         """Retrieve set of curves from the library by name.
@@ -300,13 +499,250 @@ class Library:
         c_obj = Curve(eqp, c_prop["type"])
         c_obj.out_var = c
         # Retrive all attributes of the curve object
-        for c_att in list(Curve(eqp, c_prop["type"]).__dict__):
+        for c_att in list(c_obj.to_dict()):
             # Set the attribute of new Curve object
             # if attrubute are identified in database entry
             if c_att in list(c_prop.keys()):
-                c_obj.__dict__[c_att] = c_prop[c_att]
+                setattr(c_obj, c_att, c_prop[c_att])
         return c_obj
 
+    def convert_coefficients(self, units):
+        """Convert the coefficients and bounds of all the curves of the library to a new unit system.
+
+        Curves of the same type with the same independent variables are converted at once.
+
+        :param str units: Unit system to convert to: `si` or `ip`
+
+        """
+        # Group curves by conversion
+        groups = {}
+        for props in self.data.values():
+            for out_var, c_prop in props.get("set_of_curves", {}).items():
+                if c_prop.get("units", "si") == units:
+                    continue
+                var_types = get_independent_variables(
+                    out_var, c_prop["type"], props.get("model")
+                )
+                key = (c_prop["type"], tuple(var_types))
+                groups.setdefault(key, []).append(c_prop)
+
+        for (c_type, var_types), c_props in groups.items():
+            m = get_conversion_matrix(c_type, var_types, units)
+            keys = ["coeff{}".format(idx) for idx in range(1, len(m) + 1)]
+            coeffs = np.array(
+                [[c_prop.get(k, 0.0) for k in keys] for c_prop in c_props]
+            )
+            for c_prop, c_coeffs in zip(c_props, coeffs @ m.T):
+                c_prop.update(zip(keys, c_coeffs.tolist()))
+                for var, var_type in zip(["x", "y"], var_types):
+                    for side in ["min", "max"]:
+                        att = "{}_{}".format(var, side)
+                        if att in c_prop.keys():
+                            c_prop[att] = convert_variable(c_prop[att], var_type, units)
+                c_prop["units"] = units
+
+        # Cached curve outputs and attributes are no longer valid, caches
+        # shared with other Library objects are left unchanged
+        self.caches = {"attribute_index": None, "grid_values": {}}
+
+    def get_curve_signature(self, name, out_var):
+        """Get the attributes that define the output of a library curve.
+
+        :param str name: Name of the library entry
+        :param str out_var: Output variable of the curve
+        :return: Curve type, units, coefficients and bounds, None if the entry does not have a curve for the output variable
+        :rtype: tuple
+
+        """
+        c_prop = self.data.get(name, {}).get("set_of_curves", {}).get(out_var)
+        if c_prop is None or not c_prop.get("type") in CURVE_EXPONENTS.keys():
+            return None
+        # Coefficients that the curve type does not use are not loaded
+        coeffs = tuple(
+            c_prop.get("coeff{}".format(idx), 0.0)
+            for idx in range(1, len(CURVE_EXPONENTS[c_prop["type"]]) + 1)
+        )
+        bounds = [
+            c_prop.get("{}_{}".format(var, side))
+            for var in ["x", "y", "out"]
+            for side in ["min", "max"]
+        ]
+        return (c_prop["type"], c_prop.get("units", "si"), coeffs, *bounds)
+
+    def get_grid_values(
+        self, out_var, ranges, grid_size=20, names=None, curves=None, shape=False
+    ):
+        """Get the normalized outputs of library curves on a grid of independent variable values.
+
+        Outputs are calculated the first time they are requested for a library entry, an output variable, a range and a normalization point (which depends on the rating standard) and are then cached.
+        By default, outputs are scaled by the ratio of the curve output at the normalization point and at the curve reference point, as done when aggregating curves.
+
+        :param str out_var: Output variable
+        :param dict ranges: Range of values of the independent variables and normalization point of the output variable, see `copper.chiller.Chiller.get_ranges()`
+        :param int grid_size: Number of values of each independent variable
+        :param list names: Name of the library entries, all the entries are returned if not specified
+        :param list curves: Curves of the library entries, they are evaluated instead of loading the library entries. If they differ from the library curves no outputs are returned
+        :param bool shape: Return the outputs divided by the curve output at the normalization point instead (NaN if that output is 0)
+        :return: Name of the library entries, first and second independent variable values, and normalized outputs (one row per entry and one column per point, None if not available)
+        :rtype: tuple
+
+        """
+        norm = ranges["normalization"]
+        ref_x, ref_y = (norm, 0) if isinstance(norm, float) else norm
+        vars_range = tuple(tuple(rng) for rng in ranges["vars_range"])
+        key = (out_var, vars_range, ref_x, ref_y, grid_size)
+
+        if not key in self.grid_values.keys():
+            x, y = get_grid(vars_range, grid_size)
+            self.grid_values[key] = {
+                "index": {},
+                "signatures": [],
+                "x": x,
+                "y": y,
+                "values": np.zeros((0, len(x))),
+                "shapes": np.zeros((0, len(x))),
+            }
+        grid_values = self.grid_values[key]
+        x, y = grid_values["x"], grid_values["y"]
+
+        # Equipment that cannot be loaded are skipped
+        if names is None:
+            names = [
+                name
+                for name, props in self.data.items()
+                if out_var in props.get("set_of_curves", {}).keys()
+                and props["condenser_type"] != "hr_scroll"
+            ]
+
+        # Outputs of entries that are not cached, or whose curve changed. Curves
+        # that are passed must be the library curves to be cached
+        signatures, new = [], {}
+        for idx, name in enumerate(names):
+            row = grid_values["index"].get(name)
+            if curves is None:
+                signature = self.get_curve_signature(name, out_var)
+            else:
+                c = curves[idx]
+                signature = (c.type, c.units, tuple(c.coeffs.tolist()))
+                signature += (c.x_min, c.x_max, c.y_min, c.y_max, c.out_min, c.out_max)
+                if row is None or grid_values["signatures"][row] != signature:
+                    if self.get_curve_signature(name, out_var) != signature:
+                        return names, x, y, None
+            if signature is None:
+                return names, x, y, None
+            if row is None or grid_values["signatures"][row] != signature:
+                new[name] = idx
+            signatures.append(signature)
+        if len(new) > 0:
+            if curves is None:
+                new_curves = []
+                for name in new.keys():
+                    props = self.data[name]
+                    new_curves.append(
+                        self.get_curve(out_var, props, eqp=self.load_obj(props))
+                    )
+            else:
+                new_curves = [curves[idx] for idx in new.values()]
+            ref_points = [c.get_ref_point() for c in new_curves]
+            vals = evaluate_curves(new_curves, x, y)
+            norm_vals = np.array([c.evaluate(ref_x, ref_y) for c in new_curves])
+            factors = norm_vals / np.array(
+                [c.evaluate(*ref_point) for c, ref_point in zip(new_curves, ref_points)]
+            )
+            with np.errstate(divide="ignore", invalid="ignore"):
+                shapes = np.where(
+                    norm_vals[:, np.newaxis] != 0,
+                    vals / norm_vals[:, np.newaxis],
+                    np.nan,
+                )
+            vals *= factors[:, np.newaxis]
+
+            # Rows of modified curves are replaced, the other ones are added
+            rows = []
+            for name, idx in new.items():
+                if name in grid_values["index"].keys():
+                    row = grid_values["index"][name]
+                    grid_values["signatures"][row] = signatures[idx]
+                else:
+                    row = len(grid_values["signatures"])
+                    grid_values["index"][name] = row
+                    grid_values["signatures"].append(signatures[idx])
+                rows.append(row)
+            nb_rows = len(grid_values["signatures"])
+            for att, att_vals in [("values", vals), ("shapes", shapes)]:
+                grid_values[att] = np.concatenate(
+                    [
+                        grid_values[att],
+                        np.zeros((nb_rows - grid_values[att].shape[0], len(x))),
+                    ]
+                )
+                grid_values[att][rows] = att_vals
+
+        rows = [grid_values["index"][name] for name in names]
+        vals = grid_values["shapes"] if shape else grid_values["values"]
+        return names, x, y, vals[rows]
+
+    def find_similar_curves(
+        self, curve, ranges, k=10, grid_size=20, filters=[], part_eff_flag=True
+    ):
+        """Find the library entries whose curves have the shape closest to a curve.
+
+        The shape of a curve is the vector of its outputs on the grid of independent variable values divided by its
+        output at the normalization point, see `get_grid_values()`; the vectors of the library curves are cached.
+        Shapes are compared using the root mean square of their differences.
+        Curves fitted to measurements (see `copper.curves.fit_from_measurements()`) can be used to find seed curves
+        that behave like a measured equipment.
+
+        :param Curve curve: Curve to match, measured or targeted
+        :param dict ranges: Range of values of the independent variables and normalization point of the output variable of the curve, see `copper.chiller.Chiller.get_ranges()`
+        :param int k: Number of library entries to return
+        :param int grid_size: Number of values of each independent variable
+        :param list filters: List of filters, represented by tuples (field, val), only library entries matching them are considered. Entries that use a different model than the equipment of the curve are not considered
+        :param bool part_eff_flag: Set the part load efficiency of the equipment using the library entry
+        :return: Sets of curves of the closest library entries, that can be used as seed curves, and the distance of their curve to the curve shape, both sorted by increasing distance
+        :rtype: tuple
+
+        """
+        # Candidate library entries, equipment that cannot be loaded are skipped
+        model = getattr(curve.eqp, "model", None)
+        if model is not None:
+            filters = filters + [("model", model)]
+        names = [
+            name
+            for name, props in self.find_equipment(filters).items()
+            if curve.out_var in props.get("set_of_curves", {}).keys()
+            and props["condenser_type"] != "hr_scroll"
+        ]
+        names, x, y, vals = self.get_grid_values(
+            curve.out_var, ranges, grid_size, names=names, shape=True
+        )
+        candidates = np.flatnonzero(~np.isnan(vals).any(axis=1))
+        if len(candidates) == 0:
+            return [], np.array([])
+
+        # Shape of the curve
+        norm = ranges["normalization"]
+        ref_x, ref_y = (norm, 0) if isinstance(norm, float) else norm
+        ref_out = curve.evaluate(ref_x, ref_y)
+        if ref_out == 0:
+            raise ValueError(
+                "The curve output is 0 at the normalization point, its shape cannot be determined."
+            )
+        shape = evaluate_curves([curve], x, y)[0] / ref_out
+
+        # k nearest shapes
+        dist = np.sqrt(np.mean((vals[candidates] - shape) ** 2, axis=1))
+        top = np.arange(len(candidates))
+        if k < len(candidates):
+            top = np.argpartition(dist, k - 1)[:k]
+        top = top[np.argsort(dist[top], kind="stable")]
+
+        sets = [
+            self.load_set_of_curves(names[idx], part_eff_flag)
+            for idx in candidates[top]
+        ]
+        return sets, dist[top]
+
     def find_base_curves(self, filters, eqp):
         """Find an existing equipment curve that best matches the equipment.
 
@@ -19,11 +19,11 @@ setup(
         "numpy",
         "matplotlib",
         "pandas",
-        "statsmodels",
         "CoolProp",
         "scipy",
         "click",
     ],
+    extras_require={"numba": ["numba"]},
     entry_points={
         "console_scripts": ["copper=copper.cli:cli"],
     },
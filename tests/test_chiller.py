@@ -275,6 +275,55 @@ class TestChiller(TestCase):
         cop_2 = round(chlr.calc_rated_eff("full", "cop"), 2)
         self.assertTrue(cop_1 == cop_2, f"{cop_1} is different than {cop_2}")
 
+    def test_rated_basis(self):
+
+        chlr = Chiller(
+            compressor_type="centrifugal",
+            condenser_type="water",
+            compressor_speed="constant",
+            ref_cap=471000,
+            ref_cap_unit="W",
+            full_eff=6,
+            full_eff_unit="cop",
+            part_eff_ref_std="ahri_550/590",
+            model="ect_lwt",
+            sim_engine="energyplus",
+            set_of_curves=self.lib.get_set_of_curves_by_name("14").curves,
+        )
+        curves = chlr.get_chiller_curves()
+        cap_f_t, eir_f_t, eir_f_plr = [
+            curves[c] for c in ["cap_f_t", "eir_f_t", "eir_f_plr"]
+        ]
+
+        # Part load efficiency calculated one load at a time
+        ect, lwt = chlr.get_rated_temperatures(False)
+        kwpton_lst = [
+            chlr.calc_eff_ect(
+                cap_f_t,
+                eir_f_t,
+                eir_f_plr,
+                chlr.get_eir_ref(False),
+                ect[idx],
+                lwt,
+                load,
+            )
+            / 3.412141633
+            * 12
+            for idx, load in enumerate([1, 0.75, 0.5, 0.25])
+        ]
+        iplv = 1 / (
+            (0.01 / kwpton_lst[0])
+            + (0.42 / kwpton_lst[1])
+            + (0.45 / kwpton_lst[2])
+            + (0.12 / kwpton_lst[3])
+        )
+        self.assertAlmostEqual(chlr.calc_rated_eff("part"), iplv, places=10)
+
+        # Polynomial terms are computed once per curve type and bounds
+        nb_basis = len(chlr.rated_basis)
+        chlr.calc_rated_eff("part")
+        self.assertEqual(len(chlr.rated_basis), nb_basis)
+
     def test_curves_fromm_lib(self):
 
         full_eff_target = 0.55
@@ -1,11 +1,15 @@
-from unittest import TestCase
+from unittest import TestCase, mock
 
 import copper as cp
 import matplotlib.pyplot as plt
 import numpy as np
 import CoolProp.CoolProp as CP
 import os
+import pickle
+import tempfile
+import pandas as pd
 from pathlib import Path
+from scipy.spatial.distance import cdist
 
 LOCATION = os.path.dirname(os.path.realpath(__file__))
 CHILLER_LIB = os.path.join(LOCATION, "../copper/lib", "chiller_curves.json")
@@ -81,6 +85,300 @@ class TestCurves(TestCase):
         set_of_curves.sim_engine = "energyplus"
         self.assertTrue(set_of_curves.export())
 
+    def test_evaluate_array(self):
+        for c_name in ["6", "337"]:
+            set_of_curves = self.lib.get_set_of_curves_by_name(c_name)
+            for c in set_of_curves.curves:
+                x = np.linspace(0, 45, 30)
+                y = np.linspace(0, 45, 30)[::-1]
+                vals = c.evaluate_array(x, y)
+                self.assertEqual(vals.shape, (30,))
+                for v, x_val, y_val in zip(vals, x, y):
+                    self.assertAlmostEqual(v, c.evaluate(x_val, y_val), places=10)
+
+    def test_evaluate_grid(self):
+        set_of_curves = self.lib.get_set_of_curves_by_name("6")
+        lwt, ect, plr = np.linspace(4, 10, 7), np.linspace(10, 40, 5), [0.5, 1.0]
+        grids = set_of_curves.evaluate_grid(
+            {"eir-f-t": [lwt, ect], "cap-f-t": [lwt, ect], "eir-f-plr": [plr]}
+        )
+        for c in set_of_curves.curves:
+            grid = grids[c.out_var]
+            if c.out_var == "eir-f-plr":
+                self.assertEqual(grid.shape, (2, 1))
+                self.assertAlmostEqual(grid[1, 0], c.evaluate(1.0, 0.0))
+            else:
+                self.assertEqual(grid.shape, (7, 5))
+                self.assertAlmostEqual(grid[2, 3], c.evaluate(lwt[2], ect[3]))
+
+        # All output variables need values
+        with self.assertRaises(ValueError):
+            set_of_curves.evaluate_grid({"eir-f-t": [lwt, ect]})
+
+    def test_coefficients(self):
+        set_of_curves = self.lib.get_set_of_curves_by_name("6")
+        c = set_of_curves.curves[0]
+        self.assertEqual(c.nb_coeffs(), len(cp.CURVE_EXPONENTS[c.type]))
+        self.assertEqual(c.coeff2, c.coeffs[1])
+
+        # Coefficients attributes are a view of the coefficient array
+        c.coeff2 = 1.5
+        self.assertEqual(c.coeffs[1], 1.5)
+        with self.assertRaises(AttributeError):
+            c.coeff10
+
+        # Evaluation is consistent with the polynomial definition
+        x, y = (c.x_min + c.x_max) / 2, (c.y_min + c.y_max) / 2
+        out = (
+            c.coeff1
+            + c.coeff2 * x
+            + c.coeff3 * x**2
+            + c.coeff4 * y
+            + c.coeff5 * y**2
+            + c.coeff6 * x * y
+        )
+        c.out_min, c.out_max = None, None
+        self.assertAlmostEqual(c.evaluate(x, y), out, places=10)
+
+        # Setting coefficients or bounds updates scalar evaluations
+        c.coeff1 += 1.0
+        self.assertAlmostEqual(c.evaluate(x, y), out + 1.0, places=10)
+        c.coeffs = c.coeffs * 2
+        self.assertAlmostEqual(c.evaluate(x, y), 2 * (out + 1.0), places=10)
+        c.out_max = out
+        self.assertEqual(c.evaluate(x, y), out)
+        self.assertTrue(
+            np.allclose(c.evaluate_array(np.array([x]), np.array([y])), out)
+        )
+        with self.assertRaises(ValueError):
+            c.coeffs[0] = 0.0
+
+    def test_fit_curve_types(self):
+        x, y = np.meshgrid(np.linspace(4, 10, 10), np.linspace(10, 40, 10))
+        x, y = x.ravel(), y.ravel()
+        coeffs = np.array([0.8, 0.01, -0.001, 0.02, -0.0003, 0.0004])
+        out = cp.get_basis("bi_quad", x, y) @ coeffs
+        fits = cp.fit_curve_types(x, y, out, ["quad", "bi_quad", "bi_cub"])
+
+        # Exact fits, nested models recover the same polynomial
+        self.assertTrue(np.allclose(fits["bi_quad"][0], coeffs))
+        self.assertTrue(np.allclose(fits["bi_cub"][0][:6], coeffs))
+        self.assertTrue(np.allclose(fits["bi_cub"][0][6:], 0, atol=1e-10))
+        self.assertAlmostEqual(fits["bi_quad"][1], 1.0)
+        self.assertLess(fits["quad"][1], fits["bi_quad"][1])
+
+        # Rank deficient problem, the second variable is not used
+        fits = cp.fit_curve_types(x, np.zeros_like(x), 1 + x, ["bi_quad"])
+        self.assertTrue(
+            np.allclose(cp.get_basis("bi_quad", x, 0) @ fits["bi_quad"][0], 1 + x)
+        )
+
+        with self.assertRaises(ValueError):
+            cp.fit_curve_types(x, y, out, ["quartic"])
+
+    def test_fit_curves(self):
+        # Re-fit all the library capacity curves at once
+        curves = []
+        sets = self.lib.find_set_of_curvess_from_lib(
+            filters=[("eqp_type", "chiller"), ("condenser_type", "water")]
+        )
+        for set_of_curves in sets:
+            for c in set_of_curves.curves:
+                if c.out_var == "cap-f-t" and c.type == "bi_quad":
+                    c.x_min, c.x_max, c.y_min, c.y_max = None, None, None, None
+                    c.out_min, c.out_max = None, None
+                    curves.append(c)
+        x, y = np.meshgrid(np.linspace(4, 10, 10), np.linspace(10, 40, 10))
+        x, y = x.ravel(), y.ravel()
+        outs = cp.CurveBatch(curves).evaluate(x, y)
+        types, coeffs, r_sqr = cp.fit_curves(x, y, outs, ["quad", "bi_quad"], -1)
+        self.assertEqual(types, ["bi_quad"] * len(curves))
+        self.assertTrue(np.allclose(coeffs, [c.coeffs for c in curves]))
+        self.assertTrue(np.allclose(r_sqr, 1.0))
+
+        # Non-monotonic cubic curves are not selected
+        x = np.linspace(0, 2, 20)
+        outs = [(x - 1) ** 2, x**3 + x, np.zeros_like(x)]
+        types, coeffs, r_sqr = cp.fit_curves(x, 0, outs, ["cubic"], +1, False)
+        self.assertEqual(types, [None, "cubic", None])
+        self.assertTrue(np.allclose(coeffs[1], [0, 1, 0, 1]))
+
+        # Unless they are fitted again with constraints
+        types, coeffs, r_sqr = cp.fit_curves(x, 0, outs, ["cubic"], +1)
+        self.assertEqual(types, ["cubic", "cubic", None])
+        c = cp.Curve.__new__(cp.Curve)
+        c.type, c.coeffs = "cubic", coeffs[0]
+        c.x_min, c.x_max, c.y_min, c.y_max, c.out_min, c.out_max = [None] * 6
+        self.assertTrue(c.is_monotonic(+1, x_range=(0, 2)))
+        self.assertGreater(c.derivative(np.linspace(0, 2, 1000), 0, "x").min(), -5e-3)
+
+    def test_fit_from_measurements(self):
+        chlr = self.lib.get_set_of_curves_by_name("6").curves[0].eqp
+
+        # Synthetic trend logs with noise and missing values
+        rng = np.random.default_rng(0)
+        lwt, ect = rng.uniform(5, 9, 5000), rng.uniform(15, 35, 5000)
+        coeffs = np.array([0.8, 0.01, -0.001, 0.02, -0.0003, 0.0004])
+        eir = cp.get_basis("bi_quad", lwt, ect) @ coeffs + rng.normal(0, 1e-3, 5000)
+        df = pd.DataFrame({"LWT": lwt, "ECT": ect, "EIR": eir, "Power": 1.0})
+        df.loc[::100, "EIR"] = np.nan
+        valid = df.dropna()
+        fits = cp.fit_curve_types(
+            valid["LWT"], valid["ECT"], valid["EIR"], ["bi_quad", "bi_cub"]
+        )
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "trends.csv")
+            df.to_csv(path, index=False)
+            curves = cp.fit_from_measurements(
+                chlr, "eir-f-t", path, "LWT", "ECT", "EIR", chunksize=700
+            )
+
+        # Same results as fitting all the measurements at once
+        for c_type, (curve, r_sqr) in curves.items():
+            self.assertEqual(curve.type, c_type)
+            self.assertEqual(curve.out_var, "eir-f-t")
+            self.assertTrue(np.allclose(curve.coeffs, fits[c_type][0]))
+            self.assertAlmostEqual(r_sqr, fits[c_type][1])
+            self.assertEqual(curve.x_min, lwt.min())
+            self.assertEqual(curve.y_max, ect.max())
+
+        # Univariate curves, from chunks already in memory
+        plr = np.linspace(0.1, 1, 100)
+        chunks = [pd.DataFrame({"PLR": plr, "EIR": 0.2 + 0.8 * plr**2})] * 3
+        curves = cp.fit_from_measurements(chlr, "eir-f-plr", chunks, "PLR", None, "EIR")
+        self.assertTrue(np.allclose(curves["quad"][0].coeffs, [0.2, 0, 0.8]))
+        self.assertAlmostEqual(curves["cubic"][1], 1.0)
+
+        with self.assertRaises(ValueError):
+            cp.fit_from_measurements(chlr, "eir-f-plr", [], "PLR", None, "EIR")
+
+    def test_update_coefficients(self):
+        chlr = self.lib.get_set_of_curves_by_name("6").curves[0].eqp
+        rng = np.random.default_rng(0)
+        lwt, ect = rng.uniform(5, 9, 500), rng.uniform(15, 35, 500)
+        coeffs = np.array([0.8, 0.01, -0.001, 0.02, -0.0003, 0.0004])
+        eir = cp.get_basis("bi_quad", lwt, ect) @ coeffs + rng.normal(0, 1e-3, 500)
+
+        # Point by point and batch updates match the least squares solution
+        c = cp.Curve(eqp=chlr, c_type="bi_quad")
+        for x, y, out in zip(lwt[:100], ect[:100], eir[:100]):
+            c.update_coefficients(x, y, out)
+        errors = c.update_coefficients(lwt[100:], ect[100:], eir[100:])
+        self.assertEqual(len(errors), 400)
+        fits = cp.fit_curve_types(lwt, ect, eir, ["bi_quad"])
+        self.assertTrue(np.allclose(c.coeffs, fits["bi_quad"][0], atol=1e-4))
+
+        # The covariance is kept when the curve is copied or pickled
+        new_c = pickle.loads(pickle.dumps(c.copy()))
+        self.assertTrue(np.allclose(new_c.covariance, c.covariance))
+
+        # With a forgetting factor, the curve tracks a change of performance
+        new_c.update_coefficients(lwt, ect, 1.1 * eir, forgetting_factor=0.95)
+        self.assertAlmostEqual(
+            new_c.evaluate(7, 25), 1.1 * c.evaluate(7, 25), delta=1e-3
+        )
+        with self.assertRaises(ValueError):
+            new_c.update_coefficients(7, 25, 1, forgetting_factor=0)
+
+    def test_normalized(self):
+        c = self.lib.get_set_of_curves_by_name("6").curves[0]
+        c.out_min, c.out_max = 0.5, None
+        x, y = np.linspace(4, 10, 5), np.linspace(10, 40, 5)
+        out = c.evaluate_grid(x, y)
+        norm_out = c.evaluate(6.67, 29.44)
+
+        c.normalized(6.67, 29.44)
+        self.assertAlmostEqual(c.evaluate(6.67, 29.44), 1.0)
+        self.assertTrue(np.allclose(c.evaluate_grid(x, y), out / norm_out))
+        self.assertAlmostEqual(c.out_min, 0.5 / norm_out)
+        self.assertIsNone(c.out_max)
+
+        # Negative normalization point, bounds are swapped
+        c.coeffs = -c.coeffs
+        c.out_min, c.out_max = -999, -0.1
+        c.normalized(6.67, 29.44)
+        self.assertEqual((c.out_min, c.out_max), (0.1, 999))
+        self.assertAlmostEqual(c.evaluate(6.67, 29.44), 1.0)
+
+        # Former call with data, which is ignored
+        c.coeffs = 2 * c.coeffs
+        c.normalized(pd.DataFrame(), 6.67, 29.44)
+        self.assertAlmostEqual(c.evaluate(6.67, 29.44), 1.0)
+        c.coeffs = 2 * c.coeffs
+        c.normalized(x_norm=6.67, y_norm=29.44)
+        self.assertAlmostEqual(c.evaluate(6.67, 29.44), 1.0)
+
+    def test_curve_batch(self):
+        sets = [self.lib.get_set_of_curves_by_name(name) for name in ["6", "14", "27"]]
+        curves = [s.list_to_dict()["eir-f-t"] for s in sets]
+        batch = cp.CurveBatch(curves)
+        self.assertEqual(len(batch), 3)
+
+        x = np.linspace(4, 10, 7)
+        y = np.linspace(10, 40, 7)
+        vals = batch.evaluate(x, y)
+        self.assertEqual(vals.shape, (3, 7))
+        for c, c_vals in zip(curves, vals):
+            self.assertTrue(np.allclose(c_vals, c.evaluate_array(x, y)))
+
+        # Curves of different types cannot be batched
+        with self.assertRaises(ValueError):
+            cp.CurveBatch(sets[0].curves)
+
+    def test_copy(self):
+        set_of_curves = self.lib.get_set_of_curves_by_name("6")
+        set_of_curves.source = "Library"
+        new_set_of_curves = set_of_curves.copy()
+        self.assertEqual(new_set_of_curves.source, "Library")
+        self.assertFalse(hasattr(new_set_of_curves, "__dict__"))
+
+        # Curves are copied, equipment is shared
+        c = set_of_curves.curves[0]
+        new_c = new_set_of_curves.curves[0]
+        self.assertFalse(hasattr(new_c, "__dict__"))
+        self.assertTrue(new_c.eqp is c.eqp)
+        self.assertEqual(new_c.to_dict(), c.to_dict())
+        new_c.coeff1 += 1.0
+        new_c.x_max = None
+        self.assertNotEqual(new_c.coeff1, c.coeff1)
+        self.assertIsNotNone(c.x_max)
+
+        # Nulls are only replaced for the evaluation of the curve
+        self.assertEqual(new_c.evaluate(999, 20), new_c.evaluate(998, 20))
+        self.assertIsNone(new_c.x_max)
+
+        # Curves can be pickled
+        c_unpickled = pickle.loads(pickle.dumps(c))
+        self.assertEqual(c_unpickled.to_dict(), c.to_dict())
+        self.assertEqual(c_unpickled.evaluate(7, 30), c.evaluate(7, 30))
+
+    def test_derivative(self):
+        chlr = self.lib.get_set_of_curves_by_name("6").curves[0].eqp
+        c = cp.Curve(eqp=chlr, c_type="bi_cub")
+        c.coeffs = np.array(
+            [0.5, 0.02, -0.001, 0.01, -0.0003, 0.0004, 1e-5, -2e-6, 3e-6, -4e-6]
+        )
+        c.x_min, c.x_max, c.y_min, c.y_max = 4.0, 10.0, 10.0, 40.0
+        c.out_min, c.out_max = 0.0, 5.0
+
+        # Analytic derivatives match finite differences
+        x, y, h = np.array([5.0, 7.0]), np.array([20.0, 30.0]), 1e-6
+        d_x = (c.evaluate_array(x + h, y) - c.evaluate_array(x - h, y)) / (2 * h)
+        d_y = (c.evaluate_array(x, y + h) - c.evaluate_array(x, y - h)) / (2 * h)
+        self.assertTrue(np.allclose(c.derivative(x, y, "x"), d_x, atol=1e-6))
+        self.assertTrue(np.allclose(c.derivative(x, y, "y"), d_y, atol=1e-6))
+
+        # Monotonicity
+        c = cp.Curve(eqp=chlr, c_type="quad")
+        c.coeffs = np.array([1.0, -2.0, 1.0])
+        c.x_min, c.x_max = 0.0, 2.0
+        c.out_min, c.out_max = 0.0, 5.0
+        self.assertFalse(c.is_monotonic(1))
+        self.assertFalse(c.is_monotonic(-1))
+        self.assertTrue(c.is_monotonic(1, x_range=(1.0, 2.0)))
+        self.assertTrue(c.is_monotonic(-1, x_range=(0.0, 1.0)))
+
     def test_curve_conversion(self):
         # Define equipment
         lib = cp.Library(path=CHILLER_LIB, rating_std="ahri_550/590")
@@ -128,7 +426,45 @@ class TestCurves(TestCase):
         assert c.x_max == 60.08
         assert c.y_max == 104
 
-    def test_agg(self):
+    def test_exact_curve_conversion(self):
+        lib = cp.Library(path=CHILLER_LIB)
+        for name in ["6", "337"]:
+            set_of_curves = lib.get_set_of_curves_by_name(name)
+            for c in set_of_curves.curves:
+                c.covariance = np.eye(c.nb_coeffs())
+            si_curves = set_of_curves.copy()
+            set_of_curves.convert_coefficients("ip")
+            for c, c_si in zip(set_of_curves.curves, si_curves.curves):
+                self.assertEqual(c.units, "ip")
+                var_types = cp.get_independent_variables(c.out_var, c.type, c.eqp.model)
+                for x, y in [(6.0, 25.0), (0.5, 30.0), (36.0, 0.8)]:
+                    x_ip = cp.convert_variable(x, var_types[0], "ip")
+                    y_ip = cp.convert_variable(y, var_types[1], "ip")
+                    self.assertAlmostEqual(c.evaluate(x_ip, y_ip), c_si.evaluate(x, y))
+
+            # Back to SI
+            set_of_curves.convert_coefficients("si")
+            for c, c_si in zip(set_of_curves.curves, si_curves.curves):
+                self.assertTrue(np.allclose(c.coeffs, c_si.coeffs))
+                self.assertTrue(np.allclose(c.covariance, c_si.covariance))
+                self.assertAlmostEqual(c.x_min, c_si.x_min)
+
+        # Bulk conversion of the library
+        lib.convert_coefficients("ip")
+        for name in ["6", "337"]:
+            set_of_curves = cp.Library(path=CHILLER_LIB).get_set_of_curves_by_name(name)
+            set_of_curves.convert_coefficients("ip")
+            for c in set_of_curves.curves:
+                c_prop = lib.data[name]["set_of_curves"][c.out_var]
+                self.assertEqual(c_prop["units"], "ip")
+                self.assertAlmostEqual(c_prop["x_max"], c.x_max)
+                for idx in range(1, c.nb_coeffs() + 1):
+                    self.assertAlmostEqual(
+                        c_prop["coeff{}".format(idx)], getattr(c, "coeff{}".format(idx))
+                    )
+
+    def get_water_cooled_curves(self):
+        """Get the seed curves, ranges and target attributes used by the aggregation tests."""
         filters = [
             ("eqp_type", "chiller"),
             ("sim_engine", "energyplus"),
@@ -137,11 +473,10 @@ class TestCurves(TestCase):
         ]
 
         # Run unittest with a centrifugal chiller
-        lib = cp.Library(path=CHILLER_LIB)
-        ep_wtr_screw = lib.find_set_of_curvess_from_lib(
+        ep_wtr_screw = self.lib.find_set_of_curvess_from_lib(
             filters=filters + [("source", "2"), ("compressor_type", "screw")]
         )
-        ep_wtr_scroll = lib.find_set_of_curvess_from_lib(
+        ep_wtr_scroll = self.lib.find_set_of_curvess_from_lib(
             filters=filters + [("source", "2"), ("compressor_type", "scroll")]
         )
         centrifugal_chlr = ep_wtr_screw + ep_wtr_scroll
@@ -191,6 +526,230 @@ class TestCurves(TestCase):
             "source": "Aggregation",
         }
 
+        return water_cooled_curves, sets, ranges, misc_attr
+
+    def test_agg_normalization(self):
+        water_cooled_curves, _, ranges, misc_attr = self.get_water_cooled_curves()
+
+        # Aggregated curves are normalized at the normalization point
+        for method in ["average", "median"]:
+            agg_set_of_curves = water_cooled_curves.get_aggregated_set_of_curves(
+                ranges=ranges, misc_attr=misc_attr, method=method
+            )
+            self.assertEqual(len(agg_set_of_curves.curves), 3)
+            for c in agg_set_of_curves.curves:
+                norm = ranges[c.out_var]["normalization"]
+                norm = (norm, 0) if isinstance(norm, float) else norm
+                self.assertAlmostEqual(c.evaluate(*norm), 1.0)
+
+    def test_agg_grid(self):
+        water_cooled_curves, _, ranges, misc_attr = self.get_water_cooled_curves()
+
+        # Coarse grids lead to the same curve types, adaptive grids
+        # lead to curves close to the ones obtained with a fine grid
+        agg_set_of_curves = water_cooled_curves.get_aggregated_set_of_curves(
+            ranges=ranges, misc_attr=misc_attr, method="average", grid_size=100
+        )
+        for grid_args in [{"grid_size": 5}, {"adaptive": True, "grid_size": 100}]:
+            grid_set_of_curves = water_cooled_curves.get_aggregated_set_of_curves(
+                ranges=ranges, misc_attr=misc_attr, method="average", **grid_args
+            )
+            for c, c_grid in zip(agg_set_of_curves.curves, grid_set_of_curves.curves):
+                self.assertEqual(c.type, c_grid.type)
+                if grid_args.get("adaptive"):
+                    x = np.linspace(*ranges[c.out_var]["vars_range"][0], 7)
+                    y = np.linspace(*ranges[c.out_var]["vars_range"][-1], 7)
+                    diff = c.evaluate_grid(x, y) - c_grid.evaluate_grid(x, y)
+                    self.assertLess(np.abs(diff).max(), 1e-2)
+
+    def test_agg_targets(self):
+        water_cooled_curves, _, ranges, misc_attr = self.get_water_cooled_curves()
+
+        # Aggregation for several targets at once
+        misc_attrs = [
+            dict(misc_attr, ref_cap=ref_cap, full_eff=full_eff)
+            for ref_cap, full_eff in [(200, 5.0), (400, 6.0), (800, 5.5)]
+        ]
+        for method, args in [
+            ("weighted-average", {}),
+            ("NN-weighted-average", {"N": 7}),
+        ]:
+            agg_sets_of_curves = water_cooled_curves.get_aggregated_sets_of_curves(
+                ranges=ranges, misc_attrs=misc_attrs, method=method, **args
+            )
+            self.assertEqual(len(agg_sets_of_curves), len(misc_attrs))
+            for agg_set_of_curves, target_attr in zip(agg_sets_of_curves, misc_attrs):
+                ref_set_of_curves = water_cooled_curves.get_aggregated_set_of_curves(
+                    ranges=ranges, misc_attr=target_attr, method=method, **args
+                )
+                self.assertEqual(agg_set_of_curves.ref_cap, target_attr["ref_cap"])
+                for c, c_ref in zip(agg_set_of_curves.curves, ref_set_of_curves.curves):
+                    self.assertEqual(c.type, c_ref.type)
+                    self.assertTrue(np.allclose(c.coeffs, c_ref.coeffs))
+
+        # Each target has its own equipment, the equipment of the sets of curves
+        # is not modified
+        eqp = water_cooled_curves.eqp
+        eqp_curves = eqp.set_of_curves
+        agg_sets_of_curves = water_cooled_curves.get_aggregated_sets_of_curves(
+            ranges=ranges, misc_attrs=misc_attrs
+        )
+        self.assertIs(eqp.set_of_curves, eqp_curves)
+        self.assertEqual(eqp.ref_cap, misc_attr["ref_cap"])
+        flows = []
+        for agg_set_of_curves, target_attr in zip(agg_sets_of_curves, misc_attrs):
+            target_eqp = agg_set_of_curves.curves[0].eqp
+            self.assertIsNot(target_eqp, eqp)
+            self.assertEqual(target_eqp.ref_cap, target_attr["ref_cap"])
+            self.assertIs(target_eqp.set_of_curves, agg_set_of_curves.curves)
+            flows.append(agg_set_of_curves.curves[0].ref_cond_fluid_flow)
+        self.assertEqual(len(set(flows)), len(misc_attrs))
+        self.assertGreater(flows[1], flows[0])
+
+    def test_agg_coefficients(self):
+        water_cooled_curves, sets, ranges, misc_attr = self.get_water_cooled_curves()
+
+        # Curves that are not bounded over the ranges are aggregated using their
+        # coefficients, the aggregated curve is the average of the seed curves
+        for cset in sets:
+            for c in cset.curves:
+                c.x_min, c.x_max, c.y_min, c.y_max = None, None, None, None
+                c.out_min, c.out_max = None, None
+        with mock.patch(
+            "copper.curves.evaluate_curves", wraps=cp.curves.evaluate_curves
+        ) as evaluate_curves, mock.patch(
+            "copper.curves.fit_curves", wraps=cp.curves.fit_curves
+        ) as fit_curves:
+            agg_set_of_curves = water_cooled_curves.get_aggregated_set_of_curves(
+                ranges=ranges, misc_attr=misc_attr, method="average"
+            )
+
+        # The seed curves are neither sampled nor fitted
+        self.assertFalse(evaluate_curves.called)
+        self.assertFalse(fit_curves.called)
+        for c in agg_set_of_curves.curves:
+            norm = ranges[c.out_var]["normalization"]
+            norm = (norm, 0) if isinstance(norm, float) else norm
+            x = np.linspace(*ranges[c.out_var]["vars_range"][0], 7)
+            y = np.linspace(*ranges[c.out_var]["vars_range"][-1], 7)
+            seeds = [
+                c_s for cset in sets for c_s in cset.curves if c_s.out_var == c.out_var
+            ]
+            vals = np.mean(
+                [
+                    c_s.evaluate_grid(x, y)
+                    * c_s.evaluate(*norm)
+                    / c_s.evaluate(c_s.ref_x, c_s.ref_y)
+                    for c_s in seeds
+                ],
+                axis=0,
+            )
+            norm_val = np.mean(
+                [
+                    c_s.evaluate(*norm) ** 2 / c_s.evaluate(c_s.ref_x, c_s.ref_y)
+                    for c_s in seeds
+                ]
+            )
+            self.assertTrue(np.allclose(c.evaluate_grid(x, y), vals / norm_val))
+
+    def test_nearest_neighbor_missing_attributes(self):
+        water_cooled_curves, sets, _, misc_attr = self.get_water_cooled_curves()
+
+        # Sets of curves with missing attributes are not considered, the index
+        # still refers to the position of each set of curves
+        sets[0].eqp.ref_cap = None
+        curves = cp.SetsofCurves(sets=sets, eqp=water_cooled_curves.eqp)
+        for N in [None, 7]:
+            df, best_idx = curves.nearest_neighbor_sort(target_attr=misc_attr, N=N)
+            self.assertNotIn(0, df.index)
+            self.assertEqual(len(df), len(sets) - 1 if N is None else N)
+            for idx, name in df["name"].items():
+                self.assertEqual(sets[idx].name, name)
+
+    def test_attributes_from_library(self):
+        water_cooled_curves, sets, _, _ = self.get_water_cooled_curves()
+        vars = ["ref_cap", "full_eff"]
+        ref_values = water_cooled_curves.get_attributes(vars)["values"]
+
+        # Statistics of the library are only used if the equipment is unchanged
+        curves = cp.SetsofCurves(sets=sets, eqp=water_cooled_curves.eqp, lib=self.lib)
+        attributes = curves.get_attributes(vars)
+        self.assertTrue(np.array_equal(attributes["values"], ref_values))
+        sets[0].eqp.full_eff *= 2
+        curves = cp.SetsofCurves(sets=sets, eqp=water_cooled_curves.eqp, lib=self.lib)
+        attributes = curves.get_attributes(vars)
+        self.assertEqual(attributes["values"][0, 1], sets[0].eqp.full_eff)
+        valid = attributes["values"][attributes["valid"]]
+        self.assertTrue(np.allclose(attributes["mean"], valid.mean(axis=0)))
+
+    def test_nearest_neighbor_targets(self):
+        water_cooled_curves, sets, _, misc_attr = self.get_water_cooled_curves()
+
+        # Nearest neighbors of several targets at once
+        targets = [
+            dict(misc_attr, ref_cap=ref_cap, full_eff=full_eff)
+            for ref_cap, full_eff in [(200, 5.0), (400, 6.0), (800, 5.5)]
+        ]
+        for N in [None, 7]:
+            scores, top = water_cooled_curves.nearest_neighbor_sort(
+                target_attr=targets, N=N
+            )
+            self.assertEqual(scores.shape, (len(targets), len(sets)))
+            self.assertTrue(np.allclose(scores.sum(axis=1), 1.0))
+            for target_scores, target_top, target_attr in zip(scores, top, targets):
+                df, best_idx = water_cooled_curves.nearest_neighbor_sort(
+                    target_attr=target_attr, N=N
+                )
+                self.assertEqual(target_top[0], best_idx)
+                self.assertTrue(
+                    np.allclose(target_scores[df.index.values], df["score"].values)
+                )
+                if N is not None:
+                    self.assertEqual(list(target_top), list(df.index.values))
+
+    def test_nearest_neighbor_metrics(self):
+        water_cooled_curves, _, _, misc_attr = self.get_water_cooled_curves()
+
+        # Distance metrics and weights used to find the nearest neighbors
+        for metric in ["l1", "l2", "mahalanobis"]:
+            df, best_idx = water_cooled_curves.nearest_neighbor_sort(
+                target_attr=misc_attr, metric=metric, weights=[0.7, 0.3]
+            )
+            self.assertAlmostEqual(df["score"].sum(), 1.0)
+        df, _ = water_cooled_curves.nearest_neighbor_sort(
+            target_attr=misc_attr, weights=[1.0, 0.0]
+        )
+        df_eff, _ = water_cooled_curves.nearest_neighbor_sort(
+            target_attr=dict(misc_attr, full_eff=9.0), weights=[1.0, 0.0]
+        )
+        self.assertTrue(np.allclose(df["score"], df_eff["score"]))
+        with self.assertRaises(ValueError):
+            water_cooled_curves.nearest_neighbor_sort(
+                target_attr=misc_attr, metric="cosine"
+            )
+        with self.assertRaises(ValueError):
+            water_cooled_curves.nearest_neighbor_sort(
+                target_attr=misc_attr, weights=[1.0]
+            )
+        values, targets = np.random.rand(20, 3), np.random.rand(4, 3)
+        w = np.array([0.5, 0.3, 0.2])
+        inv_cov = np.linalg.inv(np.cov(values, rowvar=False))
+        self.assertTrue(
+            np.allclose(
+                water_cooled_curves.get_distances(values, targets, "mahalanobis", w),
+                cdist(targets * w**0.5, values * w**0.5, "mahalanobis", VI=inv_cov),
+            )
+        )
+        self.assertTrue(
+            np.allclose(
+                water_cooled_curves.get_distances(values, targets, "l2", w),
+                cdist(targets * w**0.5, values * w**0.5),
+            )
+        )
+
+    def test_agg(self):
+        water_cooled_curves, _, _, misc_attr = self.get_water_cooled_curves()
+
         # checking with an empty target, we expect a Value Error
         with self.assertRaises(ValueError):
             _, _ = water_cooled_curves.nearest_neighbor_sort()
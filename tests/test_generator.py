@@ -1,6 +1,7 @@
 from unittest import TestCase
 from copper.chiller import Chiller
 from copper.generator import Generator
+from copper.library import Library
 
 
 class TestAlgorithm(TestCase):
@@ -327,3 +328,32 @@ class TestAlgorithm(TestCase):
         self.assertTrue(full_eff_alt > full_eff_target_alt * (1 - tol), full_eff_alt)
         self.assertTrue(part_eff_alt < part_eff_target_alt * (1 + tol), part_eff_alt)
         self.assertTrue(part_eff_alt > part_eff_target_alt * (1 - tol), part_eff_alt)
+
+    def test_normalization_fitness(self):
+        lib = Library()
+        chlr = Chiller(
+            compressor_type="centrifugal",
+            condenser_type="water",
+            compressor_speed="constant",
+            ref_cap=300,
+            ref_cap_unit="ton",
+            full_eff=0.61,
+            full_eff_unit="kw/ton",
+            part_eff=0.52,
+            part_eff_unit="kw/ton",
+            model="ect_lwt",
+            sim_engine="energyplus",
+        )
+        algo = Generator(equipment=chlr, vars=["eir-f-plr"])
+
+        # Populations can mix curve types
+        pop = [lib.get_set_of_curves_by_name(name) for name in ["0", "163"]]
+        curves = [
+            [c for c in set_of_curves.curves if c.out_var == "eir-f-plr"][0]
+            for set_of_curves in pop
+        ]
+        self.assertEqual([c.type for c in curves], ["quad", "cubic"])
+        x_ref, y_ref = chlr.get_ref_values("eir-f-plr")
+        scores = algo.determine_population_normalization_fitness(pop)
+        for score, c in zip(scores, curves):
+            self.assertAlmostEqual(score, abs(1 - c.evaluate(x_ref, y_ref)))
@@ -0,0 +1,111 @@
+from unittest import TestCase, mock, skipUnless
+
+import copper as cp
+import copper.kernels as kernels
+import numpy as np
+import os
+
+LOCATION = os.path.dirname(os.path.realpath(__file__))
+CHILLER_LIB = os.path.join(LOCATION, "../copper/lib", "chiller_curves.json")
+
+
+class TestKernels(TestCase):
+    def setUp(self) -> None:
+        """Runs before every test. Good place to initialize values and store common objects."""
+        self.backend = kernels.get_backend()
+
+    def tearDown(self) -> None:
+        """Runs after every test and restores the backend used by the kernels."""
+        kernels.set_backend(self.backend)
+
+    def test_set_backend(self):
+        self.assertEqual(kernels.set_backend("python"), "python")
+        self.assertEqual(kernels.get_backend(), "python")
+        self.assertIn(kernels.set_backend(), kernels.BACKENDS)
+        with self.assertRaises(ValueError):
+            kernels.set_backend("fortran")
+        if kernels.numba is None:
+            with self.assertRaises(ValueError):
+                kernels.set_backend("numba")
+
+    def test_python_backend(self):
+        kernels.set_backend("python")
+        lib = cp.Library(path=CHILLER_LIB)
+        chlr = lib.get_set_of_curves_by_name("337").curves[0].eqp
+        chlr.set_of_curves = lib.get_set_of_curves_by_name("337").curves
+        curves = chlr.get_chiller_curves()
+        curves = [curves[c] for c in ["cap_f_t", "eir_f_t", "eir_f_plr"]]
+        kernel_args = [c.get_kernel_args() for c in curves]
+        args = [6.67, 0.5, 0.95, 471.0, 5.89, 29.44, 25.0, 4.18]
+
+        # Scalar kernels do not rely on NumPy
+        with mock.patch("numpy.asarray") as asarray, mock.patch(
+            "numpy.array"
+        ) as array, mock.patch("numpy.dot") as dot:
+            outputs = [
+                kernels.evaluate_curve(*c_args, x, y)
+                for c_args in kernel_args
+                for x, y in [(2.0, 20.0), (6.67, 29.44), (8.0, 50.0)]
+            ]
+            kernels.cond_inlet_temp_residual(35.0, *args, kernel_args)
+            kernels.iplv([0.6, 0.5, 0.45, 0.55])
+        self.assertEqual(asarray.call_count + array.call_count + dot.call_count, 0)
+
+        # Kernels are consistent with the curve evaluation
+        self.assertEqual(
+            outputs,
+            [
+                c.evaluate(x, y)
+                for c in curves
+                for x, y in [(2.0, 20.0), (6.67, 29.44), (8.0, 50.0)]
+            ],
+        )
+
+    @skipUnless(kernels.numba is not None, "numba is not installed")
+    def test_backends_parity(self):
+        lib = cp.Library(path=CHILLER_LIB)
+        chlr = lib.get_set_of_curves_by_name("6").curves[0].eqp
+        chlr.set_of_curves = lib.get_set_of_curves_by_name("6").curves
+        curves = chlr.get_chiller_curves()
+        curves = [curves[c] for c in ["cap_f_t", "eir_f_t", "eir_f_plr"]]
+
+        # Curve evaluation, inside and outside of the curve bounds
+        points = [(x, y) for x in [2.0, 6.67, 8.0] for y in [0.5, 20.0, 29.44, 50.0]]
+        kernel_args = [c.get_kernel_args() for c in curves]
+        outputs, curve_outputs = {}, {}
+        for backend in kernels.BACKENDS:
+            kernels.set_backend(backend)
+            outputs[backend] = [
+                kernels.evaluate_curve(*c_args, x, y)
+                for c_args in kernel_args
+                for x, y in points
+            ]
+            curve_outputs[backend] = [
+                c.evaluate(x, y) for c in curves for x, y in points
+            ]
+        self.assertTrue(np.allclose(outputs["python"], outputs["numba"]))
+
+        # Curves are evaluated by the kernel of the numba backend
+        self.assertEqual(curve_outputs["numba"], outputs["numba"])
+        self.assertTrue(np.allclose(curve_outputs["python"], outputs["numba"]))
+
+        # Condenser temperature residual
+        args = [6.67, 0.5, 0.95, 471.0, 5.89, 29.44, 25.0, 4.18]
+        residuals = {}
+        for backend in kernels.BACKENDS:
+            kernels.set_backend(backend)
+            residuals[backend] = [
+                kernels.cond_inlet_temp_residual(lct, *args, kernel_args)
+                for lct in [30.0, 35.0, 40.0]
+            ]
+        self.assertTrue(np.allclose(residuals["python"], residuals["numba"]))
+
+        # IPLV and chiller rated efficiencies
+        ratings = {}
+        for backend in kernels.BACKENDS:
+            kernels.set_backend(backend)
+            ratings[backend] = [
+                kernels.iplv([0.6, 0.5, 0.45, 0.55]),
+                chlr.calc_rated_eff(eff_type="part", unit="cop"),
+            ]
+        self.assertTrue(np.allclose(ratings["python"], ratings["numba"]))
@@ -1,6 +1,7 @@
-from unittest import TestCase
+from unittest import TestCase, mock
 
 import copper as cp
+import numpy as np
 import os
 
 LOCATION = os.path.dirname(os.path.realpath(__file__))
@@ -84,3 +85,232 @@ class TestLibrary(TestCase):
         )
 
         assert round(chlr.calc_rated_eff("part", "cop"), 2) == 8.19  # IPLV.IP
+
+    def test_grid_values(self):
+        """
+        Test that cached library curve outputs lead to the same aggregated curves.
+        """
+        lib = cp.Library(path=CHILLER_LIB)
+        chlr = cp.Chiller(
+            compressor_type="centrifugal",
+            condenser_type="water",
+            compressor_speed="constant",
+            ref_cap=471000,
+            ref_cap_unit="W",
+            full_eff=5.89,
+            full_eff_unit="cop",
+            part_eff=0.52,
+            part_eff_unit="kw/ton",
+            model="ect_lwt",
+            sim_engine="energyplus",
+        )
+        filters = chlr.get_lib_and_filters()[1]
+        csets = chlr.get_curves_from_lib(lib=lib, filters=filters)
+        seed_curves = chlr.get_seed_curves(lib=lib, filters=filters, csets=csets)
+        ranges, misc_attr = chlr.ranges, chlr.misc_attr
+
+        # Outputs are cached for all the library entries
+        names, x, y, vals = lib.get_grid_values("eir-f-t", ranges["eir-f-t"])
+        self.assertEqual(vals.shape, (len(names), len(x)))
+        self.assertEqual(len(lib.grid_values), 1)
+
+        # Modified curves are not retrieved from the cache
+        c = csets[0].curves[0].copy()
+        names = [csets[0].name]
+        vals = lib.get_grid_values(c.out_var, ranges[c.out_var], names=names)[-1]
+        self.assertEqual(vals.shape[0], 1)
+        c.coeff1 += 0.1
+        vals = lib.get_grid_values(
+            c.out_var, ranges[c.out_var], names=names, curves=[c]
+        )[-1]
+        self.assertIsNone(vals)
+
+        # Aggregated curves are the same with and without cache
+        agg_set_of_curves = seed_curves.get_aggregated_set_of_curves(
+            ranges=ranges, misc_attr=misc_attr, method="weighted-average"
+        )
+        seed_curves.lib = None
+        ref_set_of_curves = seed_curves.get_aggregated_set_of_curves(
+            ranges=ranges, misc_attr=misc_attr, method="weighted-average"
+        )
+        for c, c_ref in zip(agg_set_of_curves.curves, ref_set_of_curves.curves):
+            self.assertEqual(c.type, c_ref.type)
+            self.assertTrue(np.allclose(c.coeffs, c_ref.coeffs))
+
+    def test_grid_values_reuse(self):
+        """
+        Test that library curve outputs cached for a chiller are reused by the next ones.
+        """
+        # Libraries loaded by other tests are parsed again
+        with mock.patch.dict("copper.library.libraries", clear=True):
+            self.check_grid_values_reuse()
+
+    def check_grid_values_reuse(self):
+        aggregated_sets = []
+        for full_eff in [0.61, 0.55]:
+            chlr = cp.Chiller(
+                compressor_type="centrifugal",
+                condenser_type="water",
+                compressor_speed="any",
+                ref_cap=300,
+                ref_cap_unit="ton",
+                full_eff=full_eff,
+                full_eff_unit="kw/ton",
+                part_eff=0.52,
+                part_eff_unit="kw/ton",
+                model="ect_lwt",
+                sim_engine="energyplus",
+            )
+            seed_curves = chlr.get_seed_curves()
+            with mock.patch(
+                "copper.library.evaluate_curves", wraps=cp.library.evaluate_curves
+            ) as evaluate_curves:
+                aggregated_sets.append(
+                    seed_curves.get_aggregated_set_of_curves(
+                        ranges=chlr.ranges,
+                        misc_attr=chlr.misc_attr,
+                        method="weighted-average",
+                    )
+                )
+
+            # Only the outputs of the requested curves are cached
+            lib = seed_curves.lib
+            for out_var in chlr.ranges.keys():
+                names = [
+                    name
+                    for name, props in lib.data.items()
+                    if out_var in props.get("set_of_curves", {}).keys()
+                ]
+                for key, grid_values in lib.grid_values.items():
+                    if key[0] == out_var:
+                        self.assertLess(len(grid_values["index"]), len(names))
+            self.assertEqual(evaluate_curves.called, len(aggregated_sets) == 1)
+
+    def test_attribute_index(self):
+        """
+        Test filtering and attribute statistics based on the attribute index.
+        """
+        lib = cp.Library(path=CHILLER_LIB)
+
+        # Filters are applied to the attribute index
+        filters = [("eqp_type", "chiller"), ("compressor_type", "~scr")]
+        eqp_match = lib.find_equipment(filters=filters)
+        self.assertTrue(len(eqp_match) > 0)
+        for props in lib.data.values():
+            self.assertEqual(
+                props in eqp_match.values(), "scr" in props["compressor_type"]
+            )
+        eqp_match = lib.find_equipment(filters=[("compressor_type", "~!scr")])
+        for props in eqp_match.values():
+            self.assertNotIn("scr", props["compressor_type"])
+
+        # Statistics of complete groups and of any entries
+        vars = ["ref_cap", "full_eff"]
+        for filters in [
+            [("condenser_type", "water"), ("model", "ect_lwt")],
+            [("condenser_type", "water"), ("source", "2")],
+        ]:
+            names = list(lib.find_equipment(filters=filters).keys())
+            values = np.array(
+                [[lib.data[name][var] for var in vars] for name in names],
+                dtype=float,
+            )
+            values = values[~np.isnan(values).any(axis=1)]
+            mean, std = lib.get_attribute_stats(names, vars)
+            self.assertTrue(np.allclose(mean, values.mean(axis=0)))
+            self.assertTrue(np.allclose(std, values.std(axis=0, ddof=1)))
+
+    def test_load_library(self):
+        """
+        Test that modifications of a loaded library do not affect other chillers.
+        """
+
+        def get_chiller():
+            return cp.Chiller(
+                compressor_type="centrifugal",
+                condenser_type="water",
+                compressor_speed="constant",
+                ref_cap=471000,
+                ref_cap_unit="W",
+                full_eff=5.89,
+                full_eff_unit="cop",
+                part_eff=0.52,
+                part_eff_unit="kw/ton",
+                model="ect_lwt",
+                sim_engine="energyplus",
+            )
+
+        chlr = get_chiller()
+        lib, filters = chlr.get_lib_and_filters(lib_path=CHILLER_LIB)
+        ref_curves = chlr.get_seed_curves(lib=lib, filters=filters).sets_of_curves
+        index = lib.get_attribute_index()
+        lib.convert_coefficients("ip")
+        lib.get_unique_curve_fields()
+        self.assertTrue(all(["set_of_curves" in v for v in lib.data.values()]))
+
+        chlr = get_chiller()
+        lib_2, filters = chlr.get_lib_and_filters(lib_path=CHILLER_LIB)
+        self.assertIsNot(lib, lib_2)
+        self.assertIs(lib_2.get_attribute_index(), index)
+        self.assertIsNot(lib.attribute_index, index)
+        seed_curves = chlr.get_seed_curves(lib=lib_2, filters=filters).sets_of_curves
+        self.assertEqual(len(seed_curves), len(ref_curves))
+        for c_set, c_set_ref in zip(seed_curves, ref_curves):
+            for c, c_ref in zip(c_set.curves, c_set_ref.curves):
+                self.assertEqual(c.units, "si")
+                self.assertEqual(c.coeff1, c_ref.coeff1)
+
+    def test_similar_curves(self):
+        """
+        Test the retrieval of library entries with a similar curve shape.
+        """
+        lib = cp.Library(path=CHILLER_LIB)
+        chlr = cp.Chiller(
+            compressor_type="centrifugal",
+            condenser_type="water",
+            compressor_speed="constant",
+            ref_cap=1250,
+            ref_cap_unit="kW",
+            full_eff=5.2,
+            full_eff_unit="cop",
+            part_eff=7.4,
+            part_eff_unit="cop",
+            model="ect_lwt",
+            sim_engine="energyplus",
+        )
+        ranges = chlr.get_ranges()
+        curve = [
+            c
+            for c in lib.get_set_of_curves_by_name("6").curves
+            if c.out_var == "eir-f-plr"
+        ][0]
+
+        # The entry of the curve is the closest one
+        sets, dist = lib.find_similar_curves(
+            curve, ranges["eir-f-plr"], k=5, filters=[("condenser_type", "water")]
+        )
+        self.assertEqual(len(sets), 5)
+        self.assertEqual(sets[0].name, "6")
+        self.assertAlmostEqual(dist[0], 0, places=3)
+        self.assertTrue(np.all(np.diff(dist) >= 0))
+        for c_set in sets:
+            self.assertEqual(c_set.eqp.model, "ect_lwt")
+
+        # Shapes do not depend on the curve output at the normalization point
+        curve = [
+            c
+            for c in lib.get_set_of_curves_by_name("27").curves
+            if c.out_var == "eir-f-t"
+        ][0]
+        norm = ranges["eir-f-t"]["normalization"]
+        self.assertTrue(abs(curve.evaluate(*norm) - 1) > 0.02)
+        sets, dist = lib.find_similar_curves(curve, ranges["eir-f-t"], k=3)
+        self.assertEqual(sets[0].name, "27")
+        self.assertAlmostEqual(dist[0], 0, places=6)
+
+        # Similar entries can be used as seed curves
+        seed_curves = chlr.get_seed_curves(lib=lib, filters=[], csets=sets)
+        agg_set_of_curves = seed_curves.get_aggregated_set_of_curves(
+            ranges=ranges, misc_attr=chlr.misc_attr
+        )
+        self.assertEqual(len(agg_set_of_curves.curves), 3)